@@ -0,0 +1,210 @@
+import adsk.core, adsk.fusion, traceback
+import importlib.util
+import os
+from array import array
+
+# The exporter itself lives in origin&rpy.py, next to this add-in or one
+# folder up; it is loaded once, so its state lives as long as the add-in
+CORE_FILE = 'origin&rpy.py'
+COMMAND_ID = 'originRpyExportCommand'
+PANEL_ID = 'SolidScriptsAddinsPanel'
+
+# Let Fusion's command events keep the pose table current between clicks;
+# when off they only flag what each command touched, for the next click
+LIVE_SYNC = False
+
+core = None
+handlers = []
+# (event, handler) pairs of the application events subscribed in run()
+ui_handlers = []
+# Occurrences selected when the running command started
+pending = []
+
+# Warm per-session state, reused by every export of the same document;
+# the table keeps the occurrence index and the dirty set between clicks,
+# 'previous' is a copy of the last export's poses, diffed against the next
+state = {
+    'document': None,
+    'table': None,
+    'previous': None,
+}
+
+def run(context):
+    global core
+    ui = None
+    try:
+        app = adsk.core.Application.get()
+        ui = app.userInterface
+        
+        core = load_core()
+        
+        cmd_def = ui.commandDefinitions.itemById(COMMAND_ID)
+        if not cmd_def:
+            cmd_def = ui.commandDefinitions.addButtonDefinition(
+                COMMAND_ID, 'Export Origins & RPY',
+                'Export component origins and RPY angles for URDF')
+        on_created = CommandCreatedHandler()
+        cmd_def.commandCreated.add(on_created)
+        handlers.append(on_created)
+        
+        panel = ui.allToolbarPanels.itemById(PANEL_ID)
+        if panel and not panel.controls.itemById(COMMAND_ID):
+            panel.controls.addCommand(cmd_def)
+        
+        if LIVE_SYNC and adsk.fusion.Design.cast(app.activeProduct):
+            core.start_live_sync(app)
+        else:
+            for event, handler in ((ui.commandStarting, CommandStartingHandler()),
+                                   (ui.commandTerminated, CommandTerminatedHandler())):
+                event.add(handler)
+                ui_handlers.append((event, handler))
+        
+    except:
+        if ui:
+            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+def stop(context):
+    ui = None
+    try:
+        app = adsk.core.Application.get()
+        ui = app.userInterface
+        
+        panel = ui.allToolbarPanels.itemById(PANEL_ID)
+        control = panel.controls.itemById(COMMAND_ID) if panel else None
+        if control:
+            control.deleteMe()
+        cmd_def = ui.commandDefinitions.itemById(COMMAND_ID)
+        if cmd_def:
+            cmd_def.deleteMe()
+        
+        if core:
+            core.stop_live_sync()
+        for event, handler in ui_handlers:
+            event.remove(handler)
+        ui_handlers.clear()
+        handlers.clear()
+        pending.clear()
+        state.update(document=None, table=None, previous=None)
+        
+    except:
+        if ui:
+            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+def load_core():
+    """
+    Import origin&rpy.py (not a valid module name) from beside the add-in
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    for folder in (here, os.path.dirname(here)):
+        path = os.path.join(folder, CORE_FILE)
+        if os.path.exists(path):
+            spec = importlib.util.spec_from_file_location('origin_rpy', path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return module
+    raise FileNotFoundError(f'{CORE_FILE} not found next to the add-in')
+
+class CommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
+    def __init__(self):
+        super().__init__()
+    
+    def notify(self, args):
+        on_execute = CommandExecuteHandler()
+        args.command.execute.add(on_execute)
+        handlers.append(on_execute)
+
+class CommandExecuteHandler(adsk.core.CommandEventHandler):
+    def __init__(self):
+        super().__init__()
+    
+    def notify(self, args):
+        ui = None
+        try:
+            app = adsk.core.Application.get()
+            ui = app.userInterface
+            export_active_design(app, ui)
+        except:
+            if ui:
+                ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+class CommandStartingHandler(adsk.core.ApplicationCommandEventHandler):
+    def __init__(self):
+        super().__init__()
+    
+    def notify(self, args):
+        try:
+            pending[:] = core.selected_occurrences(adsk.core.Application.get().userInterface)
+        except:
+            print('Failed:\n{}'.format(traceback.format_exc()))
+
+class CommandTerminatedHandler(adsk.core.ApplicationCommandEventHandler):
+    def __init__(self):
+        super().__init__()
+    
+    def notify(self, args):
+        try:
+            on_command_terminated(adsk.core.Application.get(), args)
+        except:
+            print('Failed:\n{}'.format(traceback.format_exc()))
+
+def on_command_terminated(app, args):
+    """
+    Flag in the warm table what a completed command can have moved; the
+    next export re-reads only that
+    """
+    selected = list(pending)
+    pending.clear()
+    table = state['table']
+    if table is None or state['document'] != app.activeDocument:
+        return
+    if args.commandId in core.PASSIVE_COMMANDS:
+        return
+    if args.terminationReason != adsk.core.CommandTerminationReason.CompletedTerminationReason:
+        return
+    core.mark_command_changes(table, args.commandId, selected, app.userInterface)
+
+def warm_table(app):
+    """
+    Pose table for the active document, reused across invocations
+    The first export walks the whole tree; later ones re-read only what the
+    command events flagged since the last one, and recompute what moved
+    (nothing at all with LIVE_SYNC)
+    """
+    if LIVE_SYNC and core.live_table is not None:
+        return core.live_table
+    
+    document = app.activeDocument
+    table = state['table']
+    if table is None or state['document'] != document:
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        table = core.LivePoseTable(design)
+        state.update(document=document, table=table, previous=None)
+    else:
+        table.refresh()
+    return table
+
+def snapshot_poses(table):
+    """
+    Copy of the table's current poses; components_data() shares the columns
+    that refresh() updates in place, so it can't serve as a previous export
+    """
+    return core.ComponentPoses(table.snapshot, *(array('d', column) for column in table.columns))
+
+def export_active_design(app, ui):
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    if not design:
+        ui.messageBox('No active design found')
+        return
+    
+    table = warm_table(app)
+    components_data = table.components_data()
+    if state['previous'] is not None:
+        report = core.diff_exports(state['previous'], components_data)
+        print(f"Since the last export: {len(report['moved'])} moved, "
+              f"{len(report['added'])} added, {len(report['removed'])} removed")
+    state['previous'] = snapshot_poses(table)
+    
+    if core.DISPLAY_MODE == 'palette':
+        core.display_results_palette(ui, components_data, print_origins=core.PRINT_ORIGINS)
+    else:
+        core.display_results(ui, components_data)
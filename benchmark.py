@@ -0,0 +1,303 @@
+"""
+Benchmark the exporter on synthetic assemblies, without Fusion installed
+
+A small stand-in for adsk.core / adsk.fusion builds a seeded random occurrence
+tree (configurable depth, fan-out and size), then each exporter phase is timed
+and its peak memory measured. Same arguments and seed give the same tree.
+
+    python benchmark.py --count 100000 --depth 6 --fanout 8
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'origin&rpy.py')
+
+# ---------------------------------------------------------------------------
+# Synthetic adsk stand-in
+# ---------------------------------------------------------------------------
+
+class Point3D:
+    def __init__(self, x, y, z):
+        self.x, self.y, self.z = x, y, z
+
+class Matrix3D:
+    def __init__(self, m=None):
+        self._m = tuple(m) if m is not None else IDENTITY
+
+    @staticmethod
+    def create():
+        return Matrix3D()
+
+    def asArray(self):
+        return self._m
+
+    def setWithArray(self, m):
+        self._m = tuple(m)
+        return True
+
+    def copy(self):
+        return Matrix3D(self._m)
+
+    @property
+    def translation(self):
+        m = self._m
+        return Point3D(m[3], m[7], m[11])
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+
+class Component:
+    def __init__(self, name, token):
+        self.name = name
+        self.entityToken = token
+        self.occurrences = []
+        self.allOccurrences = []
+        self.childOccurrences = self.occurrences
+        self.allJoints = []
+        self.allAsBuiltJoints = []
+
+class Occurrence:
+    """
+    Occurrence proxy in root context: transform2 is the world transform,
+    nativeObject.transform2 the transform relative to the parent
+    """
+    def __init__(self, name, component, local, world, parent):
+        self.name = name
+        self.component = component
+        self._local = local
+        self._world = world
+        self.assemblyContext = parent
+        self.childOccurrences = []
+        self.fullPathName = parent.fullPathName + '+' + name if parent else name
+        self.entityToken = 'occ:' + self.fullPathName
+
+    @property
+    def transform2(self):
+        return Matrix3D(self._world)
+
+    @property
+    def nativeObject(self):
+        return NativeOccurrence(self) if self.assemblyContext else None
+
+class NativeOccurrence:
+    def __init__(self, proxy):
+        self._proxy = proxy
+
+    @property
+    def transform2(self):
+        return Matrix3D(self._proxy._local)
+
+class Joint:
+    def __init__(self, occurrence_one, occurrence_two):
+        self.occurrenceOne = occurrence_one
+        self.occurrenceTwo = occurrence_two
+
+class Design:
+    def __init__(self, root):
+        self.rootComponent = root
+
+class Application:
+    active = None
+
+    @staticmethod
+    def get():
+        return Application.active
+
+def random_transform(rng):
+    """
+    Random rigid transform (ZYX angles, translation in cm) as 16 floats
+    """
+    roll, pitch, yaw = (rng.uniform(-math.pi, math.pi) for _ in range(3))
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return (
+        cy*cp, cy*sp*sr - sy*cr, cy*sp*cr + sy*sr, rng.uniform(-50, 50),
+        sy*cp, sy*sp*sr + cy*cr, sy*sp*cr - cy*sr, rng.uniform(-50, 50),
+        -sp, cp*sr, cp*cr, rng.uniform(-50, 50),
+        0.0, 0.0, 0.0, 1.0,
+    )
+
+def build_design(count, depth, fanout, unique_components, seed, compose):
+    """
+    Build a breadth-first synthetic assembly of at most count occurrences
+    Each occurrence gets up to fanout children, down to depth levels
+    """
+    rng = random.Random(seed)
+    root = Component('root', 'comp:root')
+    components = [Component(f'Part{i}', f'comp:{i}') for i in range(unique_components)]
+    counters = {}
+    level = [None]
+    made = 0
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for _ in range(fanout):
+                if made >= count:
+                    break
+                component = components[rng.randrange(unique_components)]
+                counters[component.name] = counters.get(component.name, 0) + 1
+                name = f'{component.name}:{counters[component.name]}'
+                local = random_transform(rng)
+                world = compose(parent._world, local) if parent else local
+                occ = Occurrence(name, component, local, world, parent)
+                (parent.childOccurrences if parent else root.occurrences).append(occ)
+                component.occurrences.append(occ)
+                next_level.append(occ)
+                made += 1
+        level = next_level
+        if made >= count or not level:
+            break
+    # allOccurrences in depth-first order, like Fusion
+    stack = list(reversed(root.occurrences))
+    while stack:
+        occ = stack.pop()
+        root.allOccurrences.append(occ)
+        stack.extend(reversed(occ.childOccurrences))
+    return Design(root)
+
+def install_fake_adsk():
+    """
+    Register the stand-in as adsk, adsk.core and adsk.fusion
+    """
+    adsk = types.ModuleType('adsk')
+    core = types.ModuleType('adsk.core')
+    fusion = types.ModuleType('adsk.fusion')
+    core.Application = Application
+    core.Matrix3D = Matrix3D
+    core.Point3D = Point3D
+    fusion.Design = Design
+    fusion.Component = Component
+    fusion.Occurrence = Occurrence
+    fusion.Joint = Joint
+    adsk.core, adsk.fusion = core, fusion
+    adsk.doEvents = lambda: None
+    sys.modules.update({'adsk': adsk, 'adsk.core': core, 'adsk.fusion': fusion})
+
+def load_script():
+    """
+    Import origin&rpy.py (not a valid module name) against the stand-in
+    """
+    install_fake_adsk()
+    spec = importlib.util.spec_from_file_location('origin_rpy', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class FakeUI:
+    def __init__(self):
+        self.messages = 0
+
+    def messageBox(self, text, *args):
+        self.messages += 1
+
+# ---------------------------------------------------------------------------
+# Phases
+# ---------------------------------------------------------------------------
+
+def phases(script, design, out_dir):
+    """
+    Return (name, callable) pairs; each callable runs one phase from scratch
+    """
+    flat = script.snapshot_occurrences(design)
+    tree = script.snapshot_occurrence_tree(design)
+    components_data = script.compute_component_origins(flat)
+    matrices = [occ.transform2 for occ in design.rootComponent.allOccurrences]
+    urdf_path = os.path.join(out_dir, 'bench.urdf')
+    origins_path = os.path.join(out_dir, 'bench_origins.txt')
+
+    def display():
+        with contextlib.redirect_stdout(io.StringIO()):
+            script.display_results(FakeUI(), components_data)
+
+    def matrix_to_rpy_scalar():
+        return [script.matrix_to_rpy(m) for m in matrices]
+
+    def matrices_to_rpy_batch():
+        return script.matrices_to_rpy(flat['transforms'] if script.np is None
+                                      else script.np.frombuffer(flat['transforms']))
+
+    return [
+        ('get_all_component_origins', lambda: script.get_all_component_origins(design)),
+        ('snapshot_flat', lambda: script.snapshot_occurrences(design)),
+        ('snapshot_tree', lambda: script.snapshot_occurrence_tree(design)),
+        ('compute_world', lambda: script.compute_component_origins(flat)),
+        ('compute_relative', lambda: script.compute_component_origins(tree, relative=True)),
+        ('matrix_to_rpy_scalar', matrix_to_rpy_scalar),
+        ('matrices_to_rpy_batch', matrices_to_rpy_batch),
+        ('display_results', display),
+        ('write_urdf_origins', lambda: script.write_urdf_origins(origins_path, components_data)),
+        ('write_urdf', lambda: script.write_urdf(urdf_path, tree, 'bench')),
+    ]
+
+def measure(func, repeat):
+    """
+    Best wall time over repeat runs, then peak traced memory of one more run
+    Memory is traced separately because tracemalloc slows the timed runs
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=10000, help='occurrences (max 100000)')
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--components', type=int, default=50, help='unique components')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help='phase names to run')
+    parser.add_argument('--json', help='also append results as one JSON line to this file')
+    args = parser.parse_args(argv)
+    count = min(args.count, 100000)
+
+    script = load_script()
+    start = time.perf_counter()
+    design = build_design(count, args.depth, args.fanout, args.components, args.seed,
+                          script.compose_arrays)
+    built = len(design.rootComponent.allOccurrences)
+    print(f"Built {built} occurrences (depth {args.depth}, fan-out {args.fanout}, "
+          f"seed {args.seed}) in {time.perf_counter() - start:.2f}s; "
+          f"numpy={'yes' if script.np is not None else 'no'}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        print(f"{'phase':<28}{'wall s':>12}{'peak MiB':>12}")
+        for name, func in phases(script, design, out_dir):
+            if args.only and name not in args.only:
+                continue
+            wall, peak = measure(func, args.repeat)
+            results[name] = {'wall_s': wall, 'peak_bytes': peak}
+            print(f"{name:<28}{wall:>12.4f}{peak / 2**20:>12.2f}")
+
+    if args.json:
+        with open(args.json, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'count': built, 'depth': args.depth, 'fanout': args.fanout,
+                'components': args.components, 'seed': args.seed,
+                'numpy': script.np is not None, 'phases': results,
+            }) + '\n')
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Report which occurrences moved between two exports, without Fusion installed
+
+Both files are .csv or .jsonl exports written by origin&rpy.py's export().
+Entries are matched by occurrence path; only those that moved further than
+the tolerances are listed, followed by added and removed paths.
+
+    python diff_exports.py v12.jsonl v13.jsonl --translation 1e-4 --angle 1e-3
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'origin&rpy.py')
+
+def load_script():
+    """
+    Import origin&rpy.py (not a valid module name); adsk is optional there
+    """
+    spec = importlib.util.spec_from_file_location('origin_rpy', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('old', help='earlier export (.csv or .jsonl)')
+    parser.add_argument('new', help='later export (.csv or .jsonl)')
+    parser.add_argument('--translation', type=float, default=1e-6,
+                        help='translation tolerance in meters')
+    parser.add_argument('--angle', type=float, default=1e-6,
+                        help='rotation tolerance in radians')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    script = load_script()
+    report = script.diff_exports(args.old, args.new, args.translation, args.angle)
+
+    if args.json:
+        print(json.dumps(report))
+        return report
+    for path, translation, angle in report['moved']:
+        print(f"moved    {path}  {translation:.6f} m  {math.degrees(angle):.4f} deg")
+    for path in report['added']:
+        print(f"added    {path}")
+    for path in report['removed']:
+        print(f"removed  {path}")
+    print(f"{len(report['moved'])} moved, {len(report['added'])} added, "
+          f"{len(report['removed'])} removed")
+    return report
+
+if __name__ == '__main__':
+    main()
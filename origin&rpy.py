@@ -1,7 +1,58 @@
-import adsk.core, adsk.fusion, adsk.fusion, traceback
+import traceback
+import sys
 import math
+import os
+import json
+import time
+import tempfile
+import hashlib
+import contextlib
+import csv
+import mmap
+import queue
+import sqlite3
+import struct
+import threading
+from array import array
+from itertools import chain
+from operator import itemgetter
+from collections import OrderedDict
+from collections.abc import Mapping
+from xml.sax.saxutils import quoteattr
+
+# adsk only exists inside Fusion; headless callers pass their own design object
+try:
+    import adsk.core, adsk.fusion
+except ImportError:
+    adsk = None
+
+# NumPy is optional: Fusion's bundled Python does not always ship it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# How run() shows results: 'palette' renders one scrollable HTML table,
+# 'messages' uses the original chain of message boxes
+DISPLAY_MODE = 'palette'
+
+# In palette mode, also print every <origin> to the Text Commands window
+# (off by default: it takes time proportional to the component count)
+PRINT_ORIGINS = False
+
+# Opt-in instrumentation: collect per-phase timings and API call counts,
+# print them after the export and append them as JSON lines to METRICS_LOG
+COLLECT_STATS = False
+METRICS_LOG = None
+
+# ExportStats of the most recent instrumented run()
+last_stats = None
+
+# Keep running after run() and maintain live_table as the design is edited
+LIVE_SYNC = False
 
 def run(context):
+    global last_stats
     ui = None
     try:
         app = adsk.core.Application.get()
@@ -13,16 +64,99 @@ def run(context):
             ui.messageBox('No active design found')
             return
         
-        # Get all component origins
-        components_data = get_all_component_origins(design)
+        if LIVE_SYNC:
+            table = start_live_sync(app)
+            adsk.autoTerminate(False)
+            print(f"Live pose sync started: {len(table)} occurrences")
+            return
+        
+        stats = ExportStats() if COLLECT_STATS else None
+        
+        # Get all component origins, with a cancellable progress dialog; one
+        # allOccurrences enumeration serves both the total and the traversal
+        occurrences = design.rootComponent.allOccurrences
+        progress = ExportProgress(ui, len(occurrences))
+        try:
+            components_data = get_all_component_origins(design, stats=stats, compact=True,
+                                                         progress=progress, read_paths=False,
+                                                         occurrences=occurrences)
+        finally:
+            progress.close()
+        if progress.cancelled:
+            print(f"Export cancelled: showing the first {len(components_data)} "
+                  f"of {progress.total} occurrences")
         
         # Display results
-        display_results(ui, components_data)
+        if DISPLAY_MODE == 'palette':
+            display_results_palette(ui, components_data, stats=stats, print_origins=PRINT_ORIGINS)
+        else:
+            display_results(ui, components_data, stats=stats)
+        
+        if stats is not None:
+            last_stats = stats
+            print(stats.summary())
+            if METRICS_LOG:
+                stats.append_jsonl(METRICS_LOG, design=design.rootComponent.name,
+                                   components=len(components_data))
         
     except:
         if ui:
             ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
+def stop(context):
+    try:
+        stop_live_sync()
+    except:
+        print('Failed:\n{}'.format(traceback.format_exc()))
+
+def export(design, output_path=None, hierarchical=False, relative=False, cache_path=None,
+           stats=None, component_cache=None):
+    """
+    Headless entry point: computes (and optionally writes) the origins with
+    no UI calls, so it runs in batch jobs and outside Fusion
+    design only needs the surface the snapshot functions read:
+    rootComponent.allOccurrences (or .occurrences for tree traversal), and per
+    occurrence name, component.name, fullPathName, transform2.asArray(),
+    nativeObject and childOccurrences
+    output_path ending in '.urdf' writes a full URDF document and '.xacro' an
+    instanced xacro file (both imply relative poses); '.csv' and '.jsonl'
+    write one row or object per component; '.sqlite' / '.db' store them as
+    the next version in a pose database (see store_poses); any other path
+    gets the commented <origin> list
+    stats, an ExportStats, collects timings and API call counts
+    component_cache, a ComponentCache, resolves each component's data once
+    Returns: components_data
+    """
+    extension = os.path.splitext(output_path)[1].lower() if output_path else ''
+    relative = relative or extension in ('.urdf', '.xacro')
+    # The commented <origin> list never shows paths (tree outputs get them free)
+    read_paths = (output_path is None or cache_path is not None
+                  or extension in ('.csv', '.jsonl', '.sqlite', '.db'))
+    
+    snapshot = snapshot_design(design, hierarchical or relative, stats, component_cache,
+                               read_paths=read_paths)
+    components_data = compute_snapshot(snapshot, relative, cache_path, stats)
+    
+    if output_path is not None:
+        with timed(stats, 'write'):
+            if extension == '.urdf':
+                write_urdf(output_path, snapshot, design.rootComponent.name,
+                           components_data=components_data)
+            elif extension == '.xacro':
+                write_xacro(output_path, snapshot, design.rootComponent.name,
+                            components_data=components_data)
+            elif extension == '.csv':
+                write_csv(output_path, components_data)
+            elif extension == '.jsonl':
+                write_jsonl(output_path, components_data)
+            elif extension in ('.sqlite', '.db'):
+                write_sqlite(output_path, components_data, design.rootComponent.name,
+                             design_version(design))
+            else:
+                write_urdf_origins(output_path, components_data)
+    
+    return components_data
+
 def get_component_origin_rpy(occurrence):
     """
     Get the origin position and RPY angles for a component occurrence
@@ -46,8 +180,12 @@ def matrix_to_rpy(transform):
     """
     Convert transformation matrix to roll, pitch, yaw angles
     """
-    m = transform.asArray()
-    
+    return rpy_from_array(transform.asArray())
+
+def rpy_from_array(m):
+    """
+    Convert a flat row-major 16-float matrix (as from asArray()) to roll, pitch, yaw angles
+    """
     # Extract the 3x3 rotation matrix
     r11, r12, r13 = m[0], m[1], m[2]
     r21, r22, r23 = m[4], m[5], m[6]
@@ -65,34 +203,2052 @@ def matrix_to_rpy(transform):
     
     return roll, pitch, yaw
 
-def get_all_component_origins(design):
+def rpy_to_array(x, y, z, roll, pitch, yaw):
+    """
+    Inverse of get_component_origin_rpy: position in meters and RPY angles
+    back to a flat row-major 16-float transform (translation in cm)
+    """
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return (
+        cy*cp, cy*sp*sr - sy*cr, cy*sp*cr + sy*sr, x * 100.0,
+        sy*cp, sy*sp*sr + cy*cr, sy*sp*cr - cy*sr, y * 100.0,
+        -sp, cp*sr, cp*cr, z * 100.0,
+        0.0, 0.0, 0.0, 1.0
+    )
+
+def matrices_to_rpy(matrices):
+    """
+    Convert a batch of transformation matrices to roll, pitch, yaw angles
+    Accepts an (N,16) or (N,4,4) buffer of row-major matrices
+    Returns: (N,3) array of (roll, pitch, yaw), matching matrix_to_rpy to within 1 ulp
+    """
+    if np is None:
+        # Pure-Python fallback: flatten 4x4 rows and reuse the scalar path
+        rows = []
+        for m in matrices:
+            if len(m) == 4:
+                m = [v for row in m for v in row]
+            rows.append(rpy_from_array(m))
+        return rows
+    
+    m = np.ascontiguousarray(matrices, dtype=np.float64).reshape(-1, 16)
+    r31, r32, r33 = m[:, 8], m[:, 9], m[:, 10]
+    
+    # Same formulas as rpy_from_array, so gimbal-lock rows (r32 = r33 = 0)
+    # resolve through arctan2 exactly like the scalar path
+    rpy = np.empty((m.shape[0], 3))
+    np.arctan2(r32, r33, out=rpy[:, 0])
+    np.arctan2(-r31, np.sqrt(r32*r32 + r33*r33), out=rpy[:, 1])
+    np.arctan2(m[:, 4], m[:, 0], out=rpy[:, 2])
+    
+    return rpy
+
+EULER_AXES = {'x': 0, 'y': 1, 'z': 2}
+ROTATION_REPRESENTATIONS = ('matrix', 'quaternion', 'euler', 'rpy')
+
+def convert_rotations(matrices, representations=('rpy',), euler_order='zyx',
+                      gimbal_tolerance=1e-9):
+    """
+    Convert a batch of rotations to several representations in one pass
+    Accepts (N,16) or (N,4,4) row-major transforms, or (N,3,3) rotations
+    representations is any subset of:
+      'matrix'     (N,3,3) rotation blocks, no trig at all
+      'quaternion' (N,4) as (x, y, z, w), the ROS tf order, with w >= 0
+      'euler'      (N,3) angles (a, b, c) with R = Ra(a) Rb(b) Rc(c) for
+                   euler_order 'abc' (any Tait-Bryan order, e.g. 'xyz', 'zyx')
+      'rpy'        (N,3) roll, pitch, yaw as in URDF ('zyx' reversed)
+    Gimbal lock (middle angle at +-90 deg, its cosine below gimbal_tolerance)
+    is handled explicitly: the last angle is set to 0 and the rotation
+    folded into the first. 'euler_gimbal_lock' / 'rpy_gimbal_lock' masks
+    mark those rows
+    Returns: dict keyed by representation name
+    """
+    unknown = set(representations) - set(ROTATION_REPRESENTATIONS)
+    if unknown:
+        raise ValueError(f'Unknown rotation representation(s): {sorted(unknown)}')
+    axes = euler_axes(euler_order)
+    
+    if np is None:
+        return convert_rotations_python(matrices, representations, axes, gimbal_tolerance)
+    
+    m = np.asarray(matrices, dtype=np.float64)
+    if m.shape[-2:] == (3, 3):
+        rotations = m.reshape(-1, 3, 3)
+    else:
+        rotations = m.reshape(-1, 4, 4)[:, :3, :3]
+    
+    result = {}
+    if 'matrix' in representations:
+        result['matrix'] = np.ascontiguousarray(rotations)
+    if 'quaternion' in representations:
+        result['quaternion'] = rotations_to_quaternions(rotations)
+    if 'euler' in representations:
+        result['euler'], result['euler_gimbal_lock'] = rotations_to_euler(
+            rotations, axes, gimbal_tolerance)
+    if 'rpy' in representations:
+        ypr, lock = rotations_to_euler(rotations, (2, 1, 0), gimbal_tolerance)
+        result['rpy'] = np.ascontiguousarray(ypr[:, ::-1])
+        result['rpy_gimbal_lock'] = lock
+    return result
+
+def euler_axes(euler_order):
+    """
+    Validate a Tait-Bryan order such as 'zyx'
+    Returns: tuple of axis indices
+    """
+    order = euler_order.lower()
+    if len(order) != 3 or set(order) != set('xyz'):
+        raise ValueError(f'Euler order must use each of x, y, z once, got {euler_order!r}')
+    return tuple(EULER_AXES[axis] for axis in order)
+
+def rotations_to_euler(rotations, axes, gimbal_tolerance=1e-9):
+    """
+    (N,3,3) rotations to (N,3) Euler angles for R = Ri(a) Rj(b) Rk(c)
+    Returns: (angles, gimbal_lock mask)
+    """
+    i, j, k = axes
+    # +1 for cyclic orders (xyz, yzx, zxy), -1 for the others
+    sign = 1.0 if (j - i) % 3 == 1 else -1.0
+    r_ii, r_ij = rotations[:, i, i], rotations[:, i, j]
+    cos_b = np.sqrt(r_ii*r_ii + r_ij*r_ij)
+    
+    angles = np.empty((rotations.shape[0], 3))
+    np.arctan2(-sign * rotations[:, j, k], rotations[:, k, k], out=angles[:, 0])
+    np.arctan2(sign * rotations[:, i, k], cos_b, out=angles[:, 1])
+    np.arctan2(-sign * r_ij, r_ii, out=angles[:, 2])
+    
+    lock = cos_b < gimbal_tolerance
+    if lock.any():
+        # Only a +- c is defined: take c = 0 and read a from the j column
+        locked = rotations[lock]
+        angles[lock, 0] = np.arctan2(sign * locked[:, k, j], locked[:, j, j])
+        angles[lock, 2] = 0.0
+    return angles, lock
+
+def rotations_to_quaternions(rotations):
+    """
+    (N,3,3) rotations to (N,4) unit quaternions (x, y, z, w), w >= 0
+    Uses Shepperd's method: each row divides by its largest component
+    """
+    r = rotations
+    diagonal = np.stack([
+        1.0 + r[:, 0, 0] + r[:, 1, 1] + r[:, 2, 2],
+        1.0 + r[:, 0, 0] - r[:, 1, 1] - r[:, 2, 2],
+        1.0 - r[:, 0, 0] + r[:, 1, 1] - r[:, 2, 2],
+        1.0 - r[:, 0, 0] - r[:, 1, 1] + r[:, 2, 2],
+    ], axis=1)
+    largest = np.argmax(diagonal, axis=1)
+    
+    # Off-diagonal sums and differences, (w, x, y, z) against each pivot
+    d21, d02, d10 = r[:, 2, 1] - r[:, 1, 2], r[:, 0, 2] - r[:, 2, 0], r[:, 1, 0] - r[:, 0, 1]
+    s01, s02, s12 = r[:, 0, 1] + r[:, 1, 0], r[:, 0, 2] + r[:, 2, 0], r[:, 1, 2] + r[:, 2, 1]
+    numerators = np.stack([
+        np.stack([diagonal[:, 0], d21, d02, d10], axis=1),
+        np.stack([d21, diagonal[:, 1], s01, s02], axis=1),
+        np.stack([d02, s01, diagonal[:, 2], s12], axis=1),
+        np.stack([d10, s02, s12, diagonal[:, 3]], axis=1),
+    ], axis=1)
+    rows = np.arange(r.shape[0])
+    wxyz = numerators[rows, largest] / (2.0 * np.sqrt(diagonal[rows, largest]))[:, None]
+    
+    wxyz[wxyz[:, 0] < 0] *= -1.0
+    return np.ascontiguousarray(wxyz[:, [1, 2, 3, 0]])
+
+def convert_rotations_python(matrices, representations, axes, gimbal_tolerance):
+    """
+    Row-by-row fallback for convert_rotations when NumPy is unavailable
+    """
+    result = {name: [] for name in representations}
+    if 'euler' in representations:
+        result['euler_gimbal_lock'] = []
+    if 'rpy' in representations:
+        result['rpy_gimbal_lock'] = []
+    
+    for m in matrices:
+        flat = [v for row in m for v in row] if len(m) in (3, 4) else list(m)
+        if len(flat) == 9:
+            r = [flat[0:3], flat[3:6], flat[6:9]]
+        else:
+            r = [flat[0:3], flat[4:7], flat[8:11]]
+        
+        if 'matrix' in representations:
+            result['matrix'].append(r)
+        if 'quaternion' in representations:
+            result['quaternion'].append(rotation_to_quaternion(r))
+        if 'euler' in representations:
+            angles, lock = rotation_to_euler(r, axes, gimbal_tolerance)
+            result['euler'].append(angles)
+            result['euler_gimbal_lock'].append(lock)
+        if 'rpy' in representations:
+            (yaw, pitch, roll), lock = rotation_to_euler(r, (2, 1, 0), gimbal_tolerance)
+            result['rpy'].append((roll, pitch, yaw))
+            result['rpy_gimbal_lock'].append(lock)
+    return result
+
+def rotation_to_euler(r, axes, gimbal_tolerance=1e-9):
+    """
+    Scalar form of rotations_to_euler for one 3x3 nested list
+    """
+    i, j, k = axes
+    sign = 1.0 if (j - i) % 3 == 1 else -1.0
+    cos_b = math.sqrt(r[i][i]*r[i][i] + r[i][j]*r[i][j])
+    b = math.atan2(sign * r[i][k], cos_b)
+    if cos_b < gimbal_tolerance:
+        return (math.atan2(sign * r[k][j], r[j][j]), b, 0.0), True
+    return (math.atan2(-sign * r[j][k], r[k][k]), b, math.atan2(-sign * r[i][j], r[i][i])), False
+
+def rotation_to_quaternion(r):
+    """
+    Scalar form of rotations_to_quaternions for one 3x3 nested list
+    """
+    diagonal = (
+        1.0 + r[0][0] + r[1][1] + r[2][2],
+        1.0 + r[0][0] - r[1][1] - r[2][2],
+        1.0 - r[0][0] + r[1][1] - r[2][2],
+        1.0 - r[0][0] - r[1][1] + r[2][2],
+    )
+    d21, d02, d10 = r[2][1] - r[1][2], r[0][2] - r[2][0], r[1][0] - r[0][1]
+    s01, s02, s12 = r[0][1] + r[1][0], r[0][2] + r[2][0], r[1][2] + r[2][1]
+    numerators = (
+        (diagonal[0], d21, d02, d10),
+        (d21, diagonal[1], s01, s02),
+        (d02, s01, diagonal[2], s12),
+        (d10, s02, s12, diagonal[3]),
+    )
+    largest = max(range(4), key=diagonal.__getitem__)
+    scale = 2.0 * math.sqrt(diagonal[largest])
+    w, x, y, z = (v / scale for v in numerators[largest])
+    if w < 0:
+        w, x, y, z = -w, -x, -y, -z
+    return x, y, z, w
+
+def get_all_component_origins(design, hierarchical=False, relative=False, cache_path=None,
+                              stats=None, compact=False, component_cache=None, progress=None,
+                              read_paths=True, occurrences=None):
     """
     Get origin and RPY for all components in the assembly
+    hierarchical=True walks the occurrence tree and composes world transforms
+    from local ones instead of asking Fusion for each transform2
+    relative=True reports each occurrence relative to its parent occurrence
+    (URDF joint frame) and implies the hierarchical traversal
+    cache_path reuses poses of unmoved occurrences from a previous run
+    compact=True returns a ComponentPoses column store instead of a list of dicts
+    component_cache, a ComponentCache, resolves each component's data once
+    progress, e.g. an ExportProgress, can cancel the traversal; the records
+    read so far are still returned
+    read_paths=False skips one fullPathName call per occurrence on the flat
+    traversal, leaving 'path' as None (the pose cache always needs paths)
+    occurrences, an already enumerated root.allOccurrences, saves the flat
+    traversal from enumerating it again
     """
-    components_data = []
-    root = design.rootComponent
+    read_paths = read_paths or cache_path is not None
+    snapshot = snapshot_design(design, hierarchical or relative, stats, component_cache, progress,
+                               read_paths, occurrences)
+    return compute_snapshot(snapshot, relative, cache_path, stats, compact)
+
+def snapshot_design(design, hierarchical=False, stats=None, component_cache=None, progress=None,
+                    read_paths=True, occurrences=None):
+    """
+    Take a flat or tree snapshot, timing it as traversal + transform fetch
+    """
+    if hierarchical:
+        # Tree paths are built from names, so read_paths costs nothing there
+        take = snapshot_occurrence_tree
+        options = {'progress': progress}
+    else:
+        take = snapshot_occurrences
+        options = {'progress': progress, 'read_paths': read_paths, 'occurrences': occurrences}
+    if stats is None:
+        return take(design, None, component_cache, **options)
+    
+    fetch_before = stats.phases.get('transform_fetch', 0.0)
+    start = time.perf_counter()
+    snapshot = take(design, stats, component_cache, **options)
+    # The counting wrappers time transform fetches; the rest is traversal
+    fetch = stats.phases.get('transform_fetch', 0.0) - fetch_before
+    stats.add_time('traversal', time.perf_counter() - start - fetch)
+    if component_cache is not None:
+        stats.caches['component'] = component_cache.stats()
+    return snapshot
+
+def compute_snapshot(snapshot, relative=False, cache_path=None, stats=None, compact=False):
+    """
+    Run the math phase on a snapshot, through the pose cache if given
+    """
+    with timed(stats, 'math'):
+        if cache_path:
+            return compute_component_origins_cached(snapshot, cache_path, relative, compact)[0]
+        if compact:
+            return compute_component_poses(snapshot, relative)
+        return compute_component_origins(snapshot, relative)
+
+def snapshot_occurrences(design, stats=None, component_cache=None, progress=None,
+                         read_paths=True, occurrences=None):
+    """
+    Read every occurrence's raw transform and names from Fusion in one pass
+    Returns: dict with 'names', 'components' and full 'paths' lists and a flat
+    'transforms' array('d') holding 16 row-major floats per occurrence
+    stats, if given, counts and times the API calls made
+    component_cache, if given, resolves component names once per component
+    progress.step() is called per occurrence; returning True stops early
+    read_paths=False skips occ.fullPathName and stores None paths
+    occurrences replaces root.allOccurrences when the caller already has it
+    """
+    snapshot = empty_snapshot()
+    names = snapshot['names']
+    components = snapshot['components']
+    paths = snapshot['paths']
+    transforms = snapshot['transforms']
     
+    rows = iter_occurrence_rows(design, stats, component_cache, progress, read_paths, occurrences)
+    for name, component, path, m in rows:
+        transforms.extend(m)
+        names.append(name)
+        components.append(component)
+        paths.append(path)
+    
+    return snapshot
+
+def empty_snapshot():
+    return {'names': [], 'components': [], 'paths': [], 'transforms': array('d')}
+
+def iter_occurrence_rows(design, stats=None, component_cache=None, progress=None,
+                         read_paths=True, occurrences=None):
+    """
+    Yield (name, component name, full path, 16-float transform) for every
+    occurrence in root.allOccurrences, skipping any that fail to read
+    Stops early when progress.step() returns True (cancelled)
+    read_paths=False yields None for the path
+    occurrences, if given, is that collection already enumerated
+    """
     # Get all occurrences in the assembly
-    all_occurrences = root.allOccurrences
+    all_occurrences = occurrences
+    if all_occurrences is None:
+        all_occurrences = design.rootComponent.allOccurrences
+    if stats is not None:
+        all_occurrences = (CountingOccurrence(occ, stats) for occ in all_occurrences)
     
     for occ in all_occurrences:
+        if progress is not None and progress.step():
+            return
         try:
-            x, y, z, roll, pitch, yaw = get_component_origin_rpy(occ)
+            # Read everything before yielding so a failure leaves no partial row
+            m = occ.transform2.asArray()
+            name = occ.name
+            component = component_name(occ, component_cache)
+            path = occ.fullPathName if read_paths else None
             
-            component_info = {
-                'name': occ.name,
-                'component': occ.component.name,
-                'x': x, 'y': y, 'z': z,
-                'roll': roll, 'pitch': pitch, 'yaw': yaw
-            }
-            components_data.append(component_info)
+        except Exception as e:
+            print(f"Error processing {occ.name}: {e}")
+            continue
+        
+        yield name, component, path, m
+
+def snapshot_occurrence_tree(design, stats=None, component_cache=None, keep_occurrences=False,
+                             progress=None):
+    """
+    Walk the occurrence tree reading only local transforms, composing world
+    transforms down the tree from the parent's already-composed matrix
+    Returns: same dict as snapshot_occurrences plus a 'parents' array of
+    parent indices (-1 for occurrences directly under the root)
+    keep_occurrences=True also keeps the 'occurrences' handles and their
+    'locals' transforms, for tables that update in place later
+    progress.step() is called per occurrence; returning True stops early,
+    leaving a valid tree (parents always precede their children)
+    """
+    names = []
+    components = []
+    paths = []
+    transforms = array('d')
+    parents = array('l')
+    occurrences = []
+    locals_ = array('d')
+    root = design.rootComponent
+    
+    # Depth-first with an explicit stack of (occurrence, parent index)
+    top_level = list(root.occurrences)
+    if stats is not None:
+        # Wrapped occurrences hand out wrapped children, so one layer suffices
+        top_level = [CountingOccurrence(occ, stats) for occ in top_level]
+    stack = [(occ, -1) for occ in reversed(top_level)]
+    
+    while stack:
+        if progress is not None and progress.step():
+            break
+        occ, parent = stack.pop()
+        try:
+            local = local_transform_array(occ)
+            name = occ.name
+            component = component_name(occ, component_cache)
+            children = list(occ.childOccurrences)
             
         except Exception as e:
+            # Without this occurrence's transform its subtree can't be composed
             print(f"Error processing {occ.name}: {e}")
+            continue
+        
+        if parent < 0:
+            world = local
+            path = name
+        else:
+            world = compose_arrays(transforms[parent*16:(parent+1)*16], local)
+            # Same '+'-joined form as Occurrence.fullPathName, without the API call
+            path = paths[parent] + '+' + name
+        
+        index = len(names)
+        transforms.extend(world)
+        names.append(name)
+        components.append(component)
+        paths.append(path)
+        parents.append(parent)
+        if keep_occurrences:
+            occurrences.append(occ)
+            locals_.extend(local)
+        
+        stack.extend((child, index) for child in reversed(children))
     
-    return components_data
+    snapshot = {'names': names, 'components': components, 'paths': paths,
+                'transforms': transforms, 'parents': parents}
+    if keep_occurrences:
+        snapshot['occurrences'] = occurrences
+        snapshot['locals'] = locals_
+    return snapshot
+
+def component_name(occurrence, component_cache=None):
+    """
+    Name of an occurrence's component, interned since patterned parts repeat it
+    """
+    if component_cache is not None:
+        return component_cache.get(occurrence.component)['name']
+    return sys.intern(occurrence.component.name)
+
+def resolve_component_data(component):
+    """
+    Component-level data read once per unique component by ComponentCache
+    """
+    return {'name': sys.intern(component.name)}
+
+class ComponentCache:
+    """
+    Per-run LRU cache of component-level data, keyed by entityToken
+    (the Python wrappers Fusion hands out are new objects on every access,
+    so they can't serve as keys). Thousands of occurrences of the same few
+    components then cost one resolve each, plus a token read per occurrence
+    That token read costs as much as reading component.name, so the cache
+    saves nothing for names alone and run() does not use it; it pays off
+    when resolve(component) reads more component-level data (bodies,
+    physical properties, ...) that would otherwise be read per occurrence
+    resolve(component) returns the cached dict; it must include 'name'
+    """
+    def __init__(self, max_size=4096, resolve=resolve_component_data):
+        self.max_size = max_size
+        self.resolve = resolve
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+    
+    def get(self, component):
+        key = component.entityToken
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+        
+        self.misses += 1
+        entry = self.resolve(component)
+        self._entries[key] = entry
+        if len(self._entries) > self.max_size:
+            # Evict the least recently used component
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._entries), 'hit_rate': self.hit_rate()}
+    
+    def clear(self):
+        self._entries.clear()
+
+def local_transform_array(occurrence):
+    """
+    Get an occurrence's transform relative to its parent as 16 floats
+    Proxies report transform2 in root space, so read the native occurrence
+    """
+    native = occurrence.nativeObject
+    return (native or occurrence).transform2.asArray()
+
+def compose_arrays(a, b):
+    """
+    Multiply two flat row-major affine 4x4 matrices: returns a * b
+    """
+    a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11 = a[:12]
+    b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11 = b[:12]
+    return (
+        a0*b0 + a1*b4 + a2*b8, a0*b1 + a1*b5 + a2*b9, a0*b2 + a1*b6 + a2*b10, a0*b3 + a1*b7 + a2*b11 + a3,
+        a4*b0 + a5*b4 + a6*b8, a4*b1 + a5*b5 + a6*b9, a4*b2 + a5*b6 + a6*b10, a4*b3 + a5*b7 + a6*b11 + a7,
+        a8*b0 + a9*b4 + a10*b8, a8*b1 + a9*b5 + a10*b9, a8*b2 + a9*b6 + a10*b10, a8*b3 + a9*b7 + a10*b11 + a11,
+        0.0, 0.0, 0.0, 1.0
+    )
+
+def invert_array(m):
+    """
+    Invert a flat row-major rigid transform (rotation + translation)
+    """
+    r11, r12, r13, tx, r21, r22, r23, ty, r31, r32, r33, tz = m[:12]
+    # Transpose the rotation and rotate the negated translation back
+    return (
+        r11, r21, r31, -(r11*tx + r21*ty + r31*tz),
+        r12, r22, r32, -(r12*tx + r22*ty + r32*tz),
+        r13, r23, r33, -(r13*tx + r23*ty + r33*tz),
+        0.0, 0.0, 0.0, 1.0
+    )
+
+def relative_transforms(snapshot):
+    """
+    Compute every occurrence's transform relative to its parent occurrence
+    Each parent's inverse is computed once and shared by all its children
+    Returns: flat array('d') laid out like snapshot['transforms']
+    """
+    transforms = snapshot['transforms']
+    parents = snapshot['parents']
+    
+    if np is not None and len(parents):
+        m = np.frombuffer(transforms, dtype=np.float64).reshape(-1, 4, 4)
+        p = np.frombuffer(parents, dtype=parents.typecode)
+        rel = m.copy()
+        has_parent = p >= 0
+        # Invert each distinct parent once, then compose all children in one batch
+        unique, slot = np.unique(p[has_parent], return_inverse=True)
+        rotations = m[unique, :3, :3].transpose(0, 2, 1)
+        inverses = np.zeros((len(unique), 4, 4))
+        inverses[:, :3, :3] = rotations
+        inverses[:, :3, 3] = -(rotations @ m[unique, :3, 3:])[:, :, 0]
+        inverses[:, 3, 3] = 1.0
+        rel[has_parent] = inverses[slot] @ m[has_parent]
+        result = array('d')
+        result.frombytes(rel.tobytes())
+        return result
+    
+    result = array('d')
+    inverse_cache = {}
+    for i, parent in enumerate(parents):
+        m = transforms[i*16:(i+1)*16]
+        if parent < 0:
+            # Directly under the root: world and parent frames coincide
+            result.extend(m)
+            continue
+        inverse = inverse_cache.get(parent)
+        if inverse is None:
+            inverse = invert_array(transforms[parent*16:(parent+1)*16])
+            inverse_cache[parent] = inverse
+        result.extend(compose_arrays(inverse, m))
+    
+    return result
+
+def compute_component_origins(snapshot, relative=False):
+    """
+    Compute origin and RPY for every occurrence in a snapshot
+    Pure math: never touches the Fusion API
+    relative=True needs a tree snapshot and reports poses in the parent frame,
+    adding a 'parent' name to each record (None directly under the root)
+    """
+    return list(iter_component_origins(snapshot, relative))
+
+def iter_component_origins(snapshot, relative=False, chunk_size=4096):
+    """
+    Generator form of compute_component_origins: the math runs in batches of
+    chunk_size occurrences and records are built as the consumer asks for
+    them, so memory beyond the snapshot stays flat however large it is
+    """
+    if relative:
+        transforms = relative_transforms(snapshot)
+    else:
+        transforms = snapshot['transforms']
+    
+    for start in range(0, len(transforms) // 16, chunk_size):
+        xyz, rpy = transforms_to_poses(transforms[start*16:(start + chunk_size)*16])
+        yield from iter_component_records(snapshot, xyz, rpy, relative, start)
+
+def transforms_to_poses(transforms):
+    """
+    Convert a flat array of row-major transforms to positions and angles
+    Returns: (xyz, rpy) lists of 3-tuples, positions in meters
+    """
+    if np is not None and len(transforms):
+        m = np.frombuffer(transforms, dtype=np.float64).reshape(-1, 16)
+        # Translation column of the row-major matrix (convert cm to meters)
+        xyz = (m[:, [3, 7, 11]] * 0.01).tolist()
+        rpy = matrices_to_rpy(m).tolist()
+    else:
+        xyz = []
+        rpy = []
+        for i in range(len(transforms) // 16):
+            m = transforms[i*16:(i+1)*16]
+            xyz.append((m[3] * 0.01, m[7] * 0.01, m[11] * 0.01))
+            rpy.append(rpy_from_array(m))
+    return xyz, rpy
+
+def iter_component_records(snapshot, xyz, rpy, relative=False, start=0):
+    """
+    Yield one component_info dict per snapshot occurrence from computed poses
+    xyz and rpy may cover only the occurrences from index start onwards
+    """
+    names = snapshot['names']
+    parents = snapshot['parents'] if relative else ()
+    end = start + len(xyz)
+    rows = zip(names[start:end], snapshot['components'][start:end], snapshot['paths'][start:end],
+               xyz, rpy)
+    for i, (name, component, path, (x, y, z), (roll, pitch, yaw)) in enumerate(rows, start):
+        component_info = {
+            'name': name,
+            'component': component,
+            'path': path,
+            'x': x, 'y': y, 'z': z,
+            'roll': roll, 'pitch': pitch, 'yaw': yaw
+        }
+        if relative:
+            parent = parents[i]
+            component_info['parent'] = names[parent] if parent >= 0 else None
+        yield component_info
+
+def compute_component_poses(snapshot, relative=False):
+    """
+    Compact form of compute_component_origins: the same records, stored as
+    array('d') columns instead of one dict of boxed floats per occurrence
+    """
+    if relative:
+        transforms = relative_transforms(snapshot)
+    else:
+        transforms = snapshot['transforms']
+    
+    columns = [array('d') for _ in range(6)]
+    if np is not None and len(transforms):
+        m = np.frombuffer(transforms, dtype=np.float64).reshape(-1, 16)
+        rpy = matrices_to_rpy(m)
+        values = (m[:, 3] * 0.01, m[:, 7] * 0.01, m[:, 11] * 0.01, rpy[:, 0], rpy[:, 1], rpy[:, 2])
+        for column, value in zip(columns, values):
+            column.frombytes(np.ascontiguousarray(value).tobytes())
+    else:
+        x, y, z, roll, pitch, yaw = columns
+        for i in range(len(transforms) // 16):
+            m = transforms[i*16:(i+1)*16]
+            x.append(m[3] * 0.01)
+            y.append(m[7] * 0.01)
+            z.append(m[11] * 0.01)
+            r, p, w = rpy_from_array(m)
+            roll.append(r)
+            pitch.append(p)
+            yaw.append(w)
+    
+    return ComponentPoses(snapshot, *columns, relative=relative)
+
+class ComponentPoses:
+    """
+    Struct-of-arrays container for component origins
+    Positions and angles live in array('d') columns; names, interned component
+    names and paths are shared with the snapshot. Indexing and iteration give
+    ComponentRecord views that read like the component_info dicts
+    """
+    FIELDS = ('name', 'component', 'path', 'x', 'y', 'z', 'roll', 'pitch', 'yaw')
+    
+    def __init__(self, snapshot, x, y, z, roll, pitch, yaw, relative=False):
+        self.names = snapshot['names']
+        self.components = snapshot['components']
+        self.paths = snapshot['paths']
+        self.parents = snapshot['parents'] if relative else None
+        self.columns = {
+            'name': self.names, 'component': self.components, 'path': self.paths,
+            'x': x, 'y': y, 'z': z, 'roll': roll, 'pitch': pitch, 'yaw': yaw,
+        }
+        self.fields = self.FIELDS + ('parent',) if relative else self.FIELDS
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.names)
+        if not 0 <= index < len(self.names):
+            raise IndexError('component index out of range')
+        return ComponentRecord(self, index)
+    
+    def __iter__(self):
+        for index in range(len(self.names)):
+            yield ComponentRecord(self, index)
+    
+    def value(self, field, index):
+        if field == 'parent' and self.parents is not None:
+            parent = self.parents[index]
+            return self.names[parent] if parent >= 0 else None
+        return self.columns[field][index]
+    
+    def to_dicts(self):
+        """
+        Expand into the list-of-dicts form (for JSON and the like)
+        """
+        return [dict(record) for record in self]
+
+class ComponentRecord(Mapping):
+    """
+    Read-only view of one row of a ComponentPoses: comp['x'], dict(comp)
+    and format_map(comp) behave as with a component_info dict
+    """
+    __slots__ = ('_poses', '_index')
+    
+    def __init__(self, poses, index):
+        self._poses = poses
+        self._index = index
+    
+    def __getitem__(self, field):
+        if field not in self._poses.fields:
+            raise KeyError(field)
+        return self._poses.value(field, self._index)
+    
+    def __iter__(self):
+        return iter(self._poses.fields)
+    
+    def __len__(self):
+        return len(self._poses.fields)
+    
+    def __repr__(self):
+        return repr(dict(self))
+
+POSE_CACHE_VERSION = 2
+
+def compute_component_origins_cached(snapshot, cache_path, relative=False, compact=False):
+    """
+    Like compute_component_origins, but serve unchanged occurrences from a
+    pose cache on disk keyed by full path and a fingerprint of the transform
+    Only new or moved occurrences are recomputed; the cache is rewritten when
+    anything changed. World and relative poses are kept side by side in the
+    same file, so alternating between the two modes reuses both
+    Returns: (components_data, changed) where changed lists recomputed paths
+    """
+    if relative:
+        transforms = relative_transforms(snapshot)
+    else:
+        transforms = snapshot['transforms']
+    paths = snapshot['paths']
+    
+    mode = 'relative' if relative else 'world'
+    modes = load_pose_cache(cache_path)
+    cached = modes.get(mode, {})
+    view = memoryview(transforms)
+    fingerprints = []
+    poses = [None] * len(paths)
+    changed = []
+    
+    for i, path in enumerate(paths):
+        fingerprint = transform_fingerprint(view[i*16:(i+1)*16])
+        fingerprints.append(fingerprint)
+        entry = cached.get(path)
+        if entry is not None and entry[0] == fingerprint:
+            poses[i] = entry[1]
+        else:
+            changed.append(i)
+    
+    # Recompute only the changed rows, still in one batch
+    if changed:
+        subset = array('d')
+        for i in changed:
+            subset.extend(view[i*16:(i+1)*16])
+        xyz, rpy = transforms_to_poses(subset)
+        for i, position, angles in zip(changed, xyz, rpy):
+            poses[i] = list(position) + list(angles)
+    
+    if changed or len(cached) != len(paths):
+        modes[mode] = {
+            path: [fingerprint, pose]
+            for path, fingerprint, pose in zip(paths, fingerprints, poses)
+        }
+        save_pose_cache(cache_path, modes)
+    
+    if compact:
+        columns = [array('d', (pose[k] for pose in poses)) for k in range(6)]
+        components_data = ComponentPoses(snapshot, *columns, relative=relative)
+    else:
+        xyz = [pose[:3] for pose in poses]
+        rpy = [pose[3:] for pose in poses]
+        components_data = list(iter_component_records(snapshot, xyz, rpy, relative))
+    return components_data, [paths[i] for i in changed]
+
+def transform_fingerprint(m):
+    """
+    Hash the raw bytes of one 16-float transform
+    """
+    return hashlib.blake2b(m, digest_size=8).hexdigest()
+
+def load_pose_cache(cache_path):
+    """
+    Load cached poses per mode ('world' / 'relative') as
+    {mode: {path: [fingerprint, [x, y, z, roll, pitch, yaw]]}}
+    A missing, unreadable or mismatched cache file yields an empty cache
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != POSE_CACHE_VERSION:
+        return {}
+    return data.get('modes', {})
+
+def save_pose_cache(cache_path, modes):
+    """
+    Write the pose cache, replacing whatever was there
+    """
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': POSE_CACHE_VERSION, 'modes': modes}, f)
+
+def parents_from_paths(paths):
+    """
+    Recover parent indices from '+'-joined full paths (flat snapshots have none)
+    Returns: array('l') with -1 for occurrences directly under the root
+    """
+    index = {path: i for i, path in enumerate(paths)}
+    parents = array('l')
+    for path in paths:
+        head, sep, _ = path.rpartition('+')
+        parents.append(index.get(head, -1) if sep else -1)
+    return parents
+
+def local_transforms_from_snapshot(snapshot):
+    """
+    Tree of a flat or tree snapshot (flat ones recover parents from paths)
+    Returns: (paths, parents, parent-relative transforms as 16 floats each, cm)
+    """
+    snapshot = dict(snapshot)
+    if snapshot.get('parents') is None:
+        snapshot['parents'] = parents_from_paths(snapshot['paths'])
+    return snapshot['paths'], snapshot['parents'], relative_transforms(snapshot)
+
+def local_transforms_from_components(components_data):
+    """
+    Tree of get_all_component_origins records, parent-relative
+    (relative=True) or root-relative
+    Returns: (paths, parents, parent-relative transforms as 16 floats each, cm)
+    """
+    paths = [comp['path'] for comp in components_data]
+    parents = parents_from_paths(paths)
+    transforms = array('d')
+    for comp in components_data:
+        transforms.extend(rpy_to_array(comp['x'], comp['y'], comp['z'],
+                                       comp['roll'], comp['pitch'], comp['yaw']))
+    if len(components_data) and 'parent' in components_data[0]:
+        # Parent-relative records already are the local transforms
+        return paths, parents, transforms
+    return paths, parents, relative_transforms({'transforms': transforms, 'parents': parents})
+
+IDENTITY_ARRAY = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+
+class OccurrenceTreeIndex:
+    """
+    Binary-lifting index over the occurrence tree for relative pose queries
+    Level k stores, for every occurrence, its 2**k-th ancestor and the
+    transform from that ancestor's frame to the occurrence's, so the lowest
+    common ancestor and the path transforms to it take O(log depth) composes
+    Occurrences are addressed by full path or by index; a virtual root
+    (index len(index)) stands for the design's root component
+    """
+    def __init__(self, paths, parents, local_transforms):
+        count = len(paths)
+        self.paths = paths
+        self.root = count
+        self._lookup = {path: i for i, path in enumerate(paths)}
+        
+        # Parents come before children in both snapshot orders, but don't rely on it
+        depth = array('l', [-1] * (count + 1))
+        depth[count] = 0
+        for i in range(count):
+            chain = []
+            v = i
+            while depth[v] < 0:
+                chain.append(v)
+                parent = parents[v]
+                v = parent if parent >= 0 else count
+            for v in reversed(chain):
+                parent = parents[v]
+                depth[v] = depth[parent if parent >= 0 else count] + 1
+        self.depth = depth
+        
+        up = array('l', (p if p >= 0 else count for p in parents))
+        up.append(count)
+        lift = array('d', local_transforms)
+        lift.extend(IDENTITY_ARRAY)
+        self.up = [up]
+        self.lift = [lift]
+        
+        # Level k: 2**k-th ancestor and the transform from it to the occurrence
+        for _ in range(1, max(1, max(depth).bit_length())):
+            up, lift = self.up[-1], self.lift[-1]
+            next_up = array('l', (up[up[v]] for v in range(count + 1)))
+            if np is not None:
+                m = np.frombuffer(lift, dtype=np.float64).reshape(-1, 4, 4)
+                composed = m[np.frombuffer(up, dtype=up.typecode)] @ m
+                next_lift = array('d')
+                next_lift.frombytes(composed.tobytes())
+            else:
+                next_lift = array('d')
+                for v in range(count + 1):
+                    a = up[v]
+                    next_lift.extend(compose_arrays(lift[a*16:(a+1)*16], lift[v*16:(v+1)*16]))
+            self.up.append(next_up)
+            self.lift.append(next_lift)
+    
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Build from a flat or tree snapshot
+        """
+        return cls(*local_transforms_from_snapshot(snapshot))
+    
+    @classmethod
+    def from_components(cls, components_data):
+        """
+        Build from get_all_component_origins records, parent-relative
+        (relative=True) or root-relative
+        """
+        return cls(*local_transforms_from_components(components_data))
+    
+    def __len__(self):
+        return self.root
+    
+    def index(self, occurrence):
+        """
+        Index of an occurrence given by full path or index (None: the root)
+        """
+        if occurrence is None:
+            return self.root
+        if isinstance(occurrence, str):
+            return self._lookup[occurrence]
+        return occurrence
+    
+    def _climb(self, v, transform, steps):
+        # Lift v by steps levels, accumulating the transform to the original node
+        k = 0
+        while steps:
+            if steps & 1:
+                transform = compose_arrays(self.lift[k][v*16:(v+1)*16], transform)
+                v = self.up[k][v]
+            steps >>= 1
+            k += 1
+        return v, transform
+    
+    def _meet(self, a, b):
+        # Climb a and b to their lowest common ancestor
+        # Returns: (ancestor, transform ancestor->a, transform ancestor->b)
+        ta = tb = IDENTITY_ARRAY
+        depth = self.depth
+        if depth[a] > depth[b]:
+            a, ta = self._climb(a, ta, depth[a] - depth[b])
+        elif depth[b] > depth[a]:
+            b, tb = self._climb(b, tb, depth[b] - depth[a])
+        if a == b:
+            return a, ta, tb
+        for k in range(len(self.up) - 1, -1, -1):
+            up, lift = self.up[k], self.lift[k]
+            if up[a] != up[b]:
+                ta = compose_arrays(lift[a*16:(a+1)*16], ta)
+                tb = compose_arrays(lift[b*16:(b+1)*16], tb)
+                a, b = up[a], up[b]
+        lift = self.lift[0]
+        ta = compose_arrays(lift[a*16:(a+1)*16], ta)
+        tb = compose_arrays(lift[b*16:(b+1)*16], tb)
+        return self.up[0][a], ta, tb
+    
+    def lca(self, a, b):
+        """
+        Lowest common ancestor of two occurrences: a path, or None for the root
+        """
+        ancestor = self._meet(self.index(a), self.index(b))[0]
+        return None if ancestor == self.root else self.paths[ancestor]
+    
+    def relative_transform(self, a, b):
+        """
+        Flat 16-float transform of occurrence a in occurrence b's frame (cm)
+        """
+        _, ta, tb = self._meet(self.index(a), self.index(b))
+        return compose_arrays(invert_array(tb), ta)
+    
+    def relative_pose(self, a, b):
+        """
+        Pose of occurrence a relative to occurrence b (None: the root)
+        Returns: (x, y, z, roll, pitch, yaw) like get_component_origin_rpy
+        """
+        m = self.relative_transform(a, b)
+        return (m[3] * 0.01, m[7] * 0.01, m[11] * 0.01) + tuple(rpy_from_array(m))
+
+JOINT_TYPES = ('revolute', 'prismatic')
+
+class ForwardKinematics:
+    """
+    Offline batch forward kinematics over an exported occurrence tree
+    Each occurrence's pose is parent pose * origin * joint motion, where the
+    origin is its parent-relative transform and joint motion is a rotation
+    about (revolute) or a translation along (prismatic) an axis given in the
+    occurrence's own frame, as in URDF. Occurrences without a joint are fixed
+    joints: {path: (type, (ax, ay, az))}; joint values follow its order
+    Needs NumPy; translations are in meters
+    """
+    def __init__(self, paths, parents, origins, joints):
+        if np is None:
+            raise ImportError('ForwardKinematics needs NumPy')
+        count = len(paths)
+        self.paths = list(paths)
+        lookup = {path: i for i, path in enumerate(self.paths)}
+        self.origins = np.array(origins, dtype=np.float64).reshape(count, 4, 4)
+        parents = np.asarray(parents, dtype=np.int64)
+        
+        # Group occurrences below the top level by depth, one batched matmul each
+        depth = np.full(count, -1)
+        for i in range(count):
+            chain = []
+            v = i
+            while v >= 0 and depth[v] < 0:
+                chain.append(v)
+                v = parents[v]
+            d = depth[v] if v >= 0 else -1
+            for v in reversed(chain):
+                d += 1
+                depth[v] = d
+        self.levels = []
+        for d in range(1, int(depth.max()) + 1 if count else 0):
+            nodes = np.flatnonzero(depth == d)
+            self.levels.append((nodes, parents[nodes]))
+        
+        self.joint_names = list(joints)
+        self.joint_nodes = np.array([lookup[path] for path in self.joint_names], dtype=np.int64)
+        if len(set(self.joint_nodes.tolist())) != len(self.joint_nodes):
+            raise ValueError('Each occurrence can carry at most one joint')
+        kinds = [joints[path][0] for path in self.joint_names]
+        for kind in kinds:
+            if kind not in JOINT_TYPES:
+                raise ValueError(f'Unknown joint type {kind!r}, expected one of {JOINT_TYPES}')
+        self.revolute = np.array([kind == 'revolute' for kind in kinds], dtype=bool)
+        axes = np.array([joints[path][1] for path in self.joint_names],
+                        dtype=np.float64).reshape(-1, 3)
+        self.axes = axes / np.linalg.norm(axes, axis=1, keepdims=True)
+        
+        # Cross-product matrices for Rodrigues' formula, built once
+        x, y, z = self.axes.T
+        zero = np.zeros_like(x)
+        self._k = np.stack([zero, -z, y, z, zero, -x, -y, x, zero], axis=1).reshape(-1, 3, 3)
+        self._k2 = self._k @ self._k
+    
+    @classmethod
+    def from_snapshot(cls, snapshot, joints):
+        """
+        Build from a tree snapshot (or a flat one, recovering parents from paths)
+        """
+        return cls.from_local_transforms(*local_transforms_from_snapshot(snapshot), joints)
+    
+    @classmethod
+    def from_components(cls, components_data, joints):
+        """
+        Build from get_all_component_origins records, parent-relative
+        (relative=True) or root-relative
+        """
+        return cls.from_local_transforms(*local_transforms_from_components(components_data),
+                                         joints)
+    
+    @classmethod
+    def from_local_transforms(cls, paths, parents, local_transforms, joints):
+        """
+        Build from parent-relative transforms in cm, as the
+        local_transforms_from_* helpers return them
+        """
+        origins = np.array(local_transforms, dtype=np.float64).reshape(-1, 4, 4)
+        origins[:, :3, 3] *= 0.01
+        return cls(paths, parents, origins, joints)
+    
+    def evaluate(self, joint_values, output='matrix'):
+        """
+        Poses of every occurrence for M joint configurations
+        joint_values: (M, num_joints), or (num_joints,) for one configuration
+        Returns: (M, N, 4, 4) root-relative transforms for output='matrix',
+        or (M, N, 6) x, y, z, roll, pitch, yaw rows for output='pose'
+        """
+        q = np.atleast_2d(np.asarray(joint_values, dtype=np.float64))
+        if q.shape[1] != len(self.joint_names):
+            raise ValueError(f'Expected {len(self.joint_names)} joint values per row, got {q.shape[1]}')
+        samples = q.shape[0]
+        
+        # Start from the fixed origins, then apply each joint's motion
+        world = np.broadcast_to(self.origins, (samples,) + self.origins.shape).copy()
+        revolute = self.revolute
+        if revolute.any():
+            nodes = self.joint_nodes[revolute]
+            theta = q[:, revolute][..., None, None]
+            rotation = np.eye(3) + np.sin(theta) * self._k[revolute] + (1.0 - np.cos(theta)) * self._k2[revolute]
+            world[:, nodes, :3, :3] = self.origins[nodes, :3, :3] @ rotation
+        prismatic = ~revolute
+        if prismatic.any():
+            nodes = self.joint_nodes[prismatic]
+            offset = q[:, prismatic, None] * self.axes[prismatic]
+            moved = world[:, nodes]
+            moved[..., :3, 3] += (self.origins[nodes, :3, :3] @ offset[..., None])[..., 0]
+            world[:, nodes] = moved
+        
+        # Compose level by level: parents are already in root frame
+        for nodes, parents in self.levels:
+            world[:, nodes] = world[:, parents] @ world[:, nodes]
+        
+        if output == 'matrix':
+            return world
+        if output == 'pose':
+            poses = np.empty(world.shape[:2] + (6,))
+            poses[..., :3] = world[..., :3, 3]
+            poses[..., 3:] = matrices_to_rpy(world.reshape(-1, 16)).reshape(world.shape[:2] + (3,))
+            return poses
+        raise ValueError(f"output must be 'matrix' or 'pose', got {output!r}")
+
+# Binary pose snapshot layout (little-endian, float blocks 8-byte aligned):
+#   header      magic, version, count, then byte offsets of each block and of the end
+#   strings     (3*count + 1) uint64 offsets into the UTF-8 blob that follows:
+#               names, then component names, then full paths
+#   parents     count int64 parent indices (-1 under the root)
+#   transforms  count x 16 float64 row-major world transforms (cm)
+#   poses       count x 6 float64 world x, y, z (m), roll, pitch, yaw (rad)
+POSE_SNAPSHOT_MAGIC = b'ORPYSNAP'
+POSE_SNAPSHOT_VERSION = 1
+POSE_SNAPSHOT_HEADER = struct.Struct('<8sIIQQQQQ')
+
+def write_pose_snapshot(path, snapshot):
+    """
+    Write a snapshot and its derived world poses as a binary file that
+    PoseSnapshotReader can memory-map
+    Returns: number of occurrences written
+    """
+    if sys.byteorder != 'little':
+        raise ValueError('Binary pose snapshots are written little-endian only')
+    if None in snapshot['paths']:
+        raise ValueError('Pose snapshots need occurrence paths; take the snapshot with '
+                         'read_paths=True')
+    
+    count = len(snapshot['names'])
+    strings = snapshot['names'] + snapshot['components'] + snapshot['paths']
+    encoded = [name.encode('utf-8') for name in strings]
+    offsets = array('Q', [0])
+    total = 0
+    for data in encoded:
+        total += len(data)
+        offsets.append(total)
+    
+    parents = snapshot.get('parents')
+    if parents is None:
+        parents = parents_from_paths(snapshot['paths'])
+    parents = array('q', parents)
+    
+    poses = compute_component_poses(snapshot)
+    columns = [poses.columns[field] for field in ('x', 'y', 'z', 'roll', 'pitch', 'yaw')]
+    if np is not None:
+        pose_block = np.column_stack([np.frombuffer(column) for column in columns])
+    else:
+        pose_block = array('d')
+        for row in zip(*columns):
+            pose_block.extend(row)
+    
+    def aligned(offset):
+        return (offset + 7) & ~7
+    
+    strings_offset = POSE_SNAPSHOT_HEADER.size
+    parents_offset = aligned(strings_offset + len(offsets) * 8 + total)
+    transforms_offset = parents_offset + count * 8
+    poses_offset = transforms_offset + count * 16 * 8
+    end = poses_offset + count * 6 * 8
+    
+    with open(path, 'wb') as f:
+        f.write(POSE_SNAPSHOT_HEADER.pack(
+            POSE_SNAPSHOT_MAGIC, POSE_SNAPSHOT_VERSION, count,
+            strings_offset, parents_offset, transforms_offset, poses_offset, end))
+        f.write(offsets.tobytes())
+        f.write(b''.join(encoded))
+        f.write(b'\0' * (parents_offset - strings_offset - len(offsets) * 8 - total))
+        f.write(parents.tobytes())
+        f.write(snapshot['transforms'].tobytes())
+        f.write(pose_block.tobytes())
+    return count
+
+class PoseSnapshotReader:
+    """
+    Memory-mapped view of a binary pose snapshot
+    parents, transforms and poses are zero-copy memoryviews over the file
+    (NumPy arrays with as_numpy); strings are decoded only when asked for
+    Use as a context manager or call close(); arrays from as_numpy (or
+    slices of the views) that outlive it keep the mapping alive until they
+    are garbage collected
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # mmap refuses empty files
+                raise ValueError(f'{path} is not a pose snapshot') from None
+        buffer = memoryview(self._mmap)
+        views = []
+        try:
+            if len(buffer) < POSE_SNAPSHOT_HEADER.size:
+                raise ValueError(f'{path} is not a pose snapshot')
+            (magic, version, count, strings_offset, parents_offset,
+             transforms_offset, poses_offset, end) = POSE_SNAPSHOT_HEADER.unpack_from(buffer)
+            if magic != POSE_SNAPSHOT_MAGIC:
+                raise ValueError(f'{path} is not a pose snapshot')
+            if version != POSE_SNAPSHOT_VERSION:
+                raise ValueError(f'Unsupported pose snapshot version {version}')
+            # Sections must follow each other in order, sized for count
+            # occurrences, and end inside the file
+            string_base = strings_offset + (3*count + 1) * 8
+            if not (POSE_SNAPSHOT_HEADER.size <= strings_offset and string_base <= parents_offset
+                    and transforms_offset - parents_offset == count * 8
+                    and poses_offset - transforms_offset == count * 16 * 8
+                    and end - poses_offset == count * 6 * 8
+                    and end <= len(buffer)):
+                raise ValueError(f'{path} has a corrupt pose snapshot header')
+            views.append(buffer[strings_offset:string_base].cast('Q'))
+            if views[0][-1] > parents_offset - string_base:
+                raise ValueError(f'{path} has a corrupt pose snapshot header')
+            views.append(buffer[parents_offset:transforms_offset].cast('q'))
+            views.append(buffer[transforms_offset:poses_offset].cast('d'))
+            views.append(buffer[poses_offset:end].cast('d'))
+        except Exception:
+            for view in views:
+                view.release()
+            buffer.release()
+            self._mmap.close()
+            raise
+        
+        self.count = count
+        self._buffer = buffer
+        self._string_offsets, self.parents, self.transforms, self.poses = views
+        self._string_base = string_base
+        self._offsets = (parents_offset, transforms_offset, poses_offset)
+    
+    def __len__(self):
+        return self.count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _string(self, i):
+        start = self._string_base + self._string_offsets[i]
+        end = self._string_base + self._string_offsets[i + 1]
+        return bytes(self._buffer[start:end]).decode('utf-8')
+    
+    def name(self, i):
+        return self._string(i)
+    
+    def component(self, i):
+        return self._string(self.count + i)
+    
+    def path(self, i):
+        return self._string(2*self.count + i)
+    
+    def transform(self, i):
+        return self.transforms[i*16:(i+1)*16]
+    
+    def pose(self, i):
+        """
+        Returns: (x, y, z, roll, pitch, yaw) of occurrence i
+        """
+        return tuple(self.poses[i*6:(i+1)*6])
+    
+    def as_numpy(self):
+        """
+        Returns: (parents (N,), transforms (N,4,4), poses (N,6)) sharing the mapping
+        """
+        parents_offset, transforms_offset, poses_offset = self._offsets
+        n = self.count
+        return (
+            np.frombuffer(self._mmap, np.int64, n, parents_offset),
+            np.frombuffer(self._mmap, np.float64, n * 16, transforms_offset).reshape(n, 4, 4),
+            np.frombuffer(self._mmap, np.float64, n * 6, poses_offset).reshape(n, 6),
+        )
+    
+    def close(self):
+        if self._mmap is None:
+            return
+        for view in (self._string_offsets, self.parents, self.transforms, self.poses, self._buffer):
+            try:
+                view.release()
+            except BufferError:
+                # Something still exports from this view; it goes with that
+                pass
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Arrays from as_numpy still point into the mapping: leave it to
+            # be unmapped when the last of them is collected
+            pass
+        self._mmap = None
+
+class ExportProgress:
+    """
+    Cancellable Fusion progress dialog for long traversals
+    step() is called once per occurrence but only touches the dialog (and
+    calls adsk.doEvents()) every check_every items and at most once per
+    interval seconds, so it costs next to nothing on huge assemblies
+    """
+    def __init__(self, ui, total, title='Exporting component origins', interval=0.2,
+                 check_every=64):
+        self.total = total
+        self.count = 0
+        self.cancelled = False
+        self.interval = interval
+        self.check_every = check_every
+        self._next_update = 0.0
+        self.dialog = ui.createProgressDialog()
+        self.dialog.isCancelButtonShown = True
+        self.dialog.cancelButtonText = 'Cancel'
+        self.dialog.show(title, 'Reading occurrences: %v of %m (%p%)', 0, max(total, 1), 1)
+    
+    def step(self):
+        """
+        Count one occurrence
+        Returns: True once the user has cancelled
+        """
+        self.count += 1
+        if self.count % self.check_every:
+            return False
+        now = time.perf_counter()
+        if now < self._next_update:
+            return False
+        self._next_update = now + self.interval
+        self.dialog.progressValue = min(self.count, self.total)
+        adsk.doEvents()
+        self.cancelled = self.dialog.wasCancelled
+        return self.cancelled
+    
+    def close(self):
+        self.dialog.hide()
+
+class ExportStats:
+    """
+    Wall time per phase (traversal, transform_fetch, math, formatting,
+    display, write) and counts of Fusion API calls for one export
+    """
+    def __init__(self):
+        self.phases = {}
+        self.calls = {}
+        self.caches = {}
+    
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+    
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+    
+    def count(self, name, n=1):
+        self.calls[name] = self.calls.get(name, 0) + n
+    
+    def as_dict(self):
+        return {'phases': dict(self.phases), 'calls': dict(self.calls),
+                'caches': dict(self.caches), 'total_s': sum(self.phases.values())}
+    
+    def summary(self):
+        """
+        Human-readable table for the Text Commands window
+        """
+        lines = ["EXPORT STATS"]
+        for name, seconds in self.phases.items():
+            lines.append(f"  {name:<22}{seconds:10.4f} s")
+        lines.append(f"  {'total':<22}{sum(self.phases.values()):10.4f} s")
+        for name, n in self.calls.items():
+            lines.append(f"  {name:<22}{n:10d} calls")
+        for name, cache in self.caches.items():
+            lines.append(f"  {name + ' cache':<22}{cache['hit_rate']:10.1%} hits "
+                         f"({cache['misses']} misses, {cache['evictions']} evictions)")
+        return "\n".join(lines)
+    
+    def append_jsonl(self, path, **extra):
+        """
+        Append this run as one JSON line, with any extra fields (design name...)
+        """
+        record = dict(extra, time=time.time(), **self.as_dict())
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+
+def timed(stats, name):
+    """
+    stats.phase(name) when instrumenting, otherwise a no-op context
+    """
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.phase(name)
+
+class CountingOccurrence:
+    """
+    Wraps an occurrence to count the API calls the snapshot functions make
+    Transform reads (transform2 + asArray) are also timed as transform_fetch
+    """
+    __slots__ = ('_occ', '_stats')
+    
+    def __init__(self, occ, stats):
+        self._occ = occ
+        self._stats = stats
+    
+    @property
+    def name(self):
+        self._stats.count('name')
+        return self._occ.name
+    
+    @property
+    def fullPathName(self):
+        self._stats.count('fullPathName')
+        return self._occ.fullPathName
+    
+    @property
+    def component(self):
+        return CountingComponent(self._occ.component, self._stats)
+    
+    @property
+    def transform2(self):
+        return counted_transform(self._occ, self._stats)
+    
+    @property
+    def nativeObject(self):
+        self._stats.count('nativeObject')
+        native = self._occ.nativeObject
+        return CountingOccurrence(native, self._stats) if native else None
+    
+    @property
+    def childOccurrences(self):
+        self._stats.count('childOccurrences')
+        return [CountingOccurrence(child, self._stats) for child in self._occ.childOccurrences]
+
+class CountingComponent:
+    __slots__ = ('_component', '_stats')
+    
+    def __init__(self, component, stats):
+        self._component = component
+        self._stats = stats
+    
+    @property
+    def name(self):
+        self._stats.count('component.name')
+        return self._component.name
+    
+    @property
+    def entityToken(self):
+        self._stats.count('component.entityToken')
+        return self._component.entityToken
+
+class CountingMatrix:
+    __slots__ = ('_matrix', '_stats')
+    
+    def __init__(self, matrix, stats):
+        self._matrix = matrix
+        self._stats = stats
+    
+    def asArray(self):
+        self._stats.count('asArray')
+        with self._stats.phase('transform_fetch'):
+            return self._matrix.asArray()
+
+def counted_transform(occ, stats):
+    stats.count('transform2')
+    with stats.phase('transform_fetch'):
+        return CountingMatrix(occ.transform2, stats)
+
+# One template per record so each line costs a single format call
+URDF_ORIGIN_FORMAT = '<origin xyz="{x:.6f} {y:.6f} {z:.6f}" rpy="{roll:.6f} {pitch:.6f} {yaw:.6f}"/>'
+URDF_ORIGIN_BLOCK_FORMAT = '<!-- {name} -->\n' + URDF_ORIGIN_FORMAT + '\n\n'
+
+def write_urdf_origins(path, components_data, buffer_size=1 << 16):
+    """
+    Stream commented <origin> elements to a file as components arrive
+    components_data can be a list or a generator such as iter_component_origins,
+    so nothing but the file buffer is held in memory
+    Returns: number of components written
+    """
+    return write_records(path, components_data, URDF_ORIGIN_BLOCK_FORMAT.format_map, buffer_size)
+
+def record_rows(components_data):
+    """
+    Field names and an iterator of one value tuple per record, in field order
+    ComponentPoses rows are zipped straight from its columns; dict records
+    (a list or a generator) go through one itemgetter call each
+    Returns: (fields, rows)
+    """
+    if isinstance(components_data, ComponentPoses):
+        columns = [components_data.columns[field] for field in ComponentPoses.FIELDS]
+        if components_data.parents is not None:
+            names = components_data.names
+            columns.append([names[p] if p >= 0 else None for p in components_data.parents])
+        return components_data.fields, zip(*columns)
+    
+    records = iter(components_data)
+    first = next(records, None)
+    if first is None:
+        return ComponentPoses.FIELDS, iter(())
+    fields = ComponentPoses.FIELDS + ('parent',) if 'parent' in first else ComponentPoses.FIELDS
+    return fields, map(itemgetter(*fields), chain((first,), records))
+
+def csv_field(text):
+    """
+    Quote a CSV text field only if it holds a separator, quote or newline
+    """
+    if text is None:
+        return ''
+    if ',' in text or '"' in text or '\n' in text or '\r' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+def write_csv(path, components_data, precision=6, buffer_size=1 << 16):
+    """
+    Write components_data as CSV: a header row, then one row per component
+    Each row is a single %-format of a template built once for the whole
+    file, rather than one format call per float
+    Returns: number of rows written
+    """
+    fields, rows = record_rows(components_data)
+    number = f'%.{precision}f'
+    template = ','.join(['%s'] * 3 + [number] * 6 + ['%s'] * (len(fields) - 9)) + '\n'
+    quote = csv_field
+    if len(fields) > 9:
+        format_row = lambda r: template % (quote(r[0]), quote(r[1]), quote(r[2]),
+                                           r[3], r[4], r[5], r[6], r[7], r[8], quote(r[9]))
+    else:
+        format_row = lambda r: template % (quote(r[0]), quote(r[1]), quote(r[2]),
+                                           r[3], r[4], r[5], r[6], r[7], r[8])
+    return write_records(path, rows, format_row, buffer_size, header=','.join(fields) + '\n')
+
+def write_jsonl(path, components_data, precision=6, buffer_size=1 << 16):
+    """
+    Write components_data as JSON Lines, one object per component
+    Like write_csv, each line is one format of a pre-built template; strings
+    go through the C JSON string encoder, numbers are fixed-point
+    NaN and infinite values (not valid JSON) are written as null, as are
+    missing paths and parents
+    Returns: number of lines written
+    """
+    fields, rows = record_rows(components_data)
+    number = f'%.{precision}f'
+    text_fields = ('name', 'component', 'path', 'parent')
+    template = '{' + ', '.join(
+        f'"{field}": ' + ('%s' if field in text_fields else number) for field in fields
+    ) + '}\n'
+    # Fallback for rows holding a non-finite value: numbers pre-formatted
+    fallback = '{' + ', '.join(f'"{field}": %s' for field in fields) + '}\n'
+    encode = json.encoder.encode_basestring_ascii
+    text = lambda value: 'null' if value is None else encode(value)
+    isfinite = math.isfinite
+    
+    def format_row(r):
+        texts = (text(r[0]), text(r[1]), text(r[2]))
+        extra = (text(r[9]),) if len(r) > 9 else ()
+        # A sum of finite values is finite, so this checks all six at once
+        if isfinite(r[3] + r[4] + r[5] + r[6] + r[7] + r[8]):
+            return template % (texts + r[3:9] + extra)
+        numbers = tuple(number % v if isfinite(v) else 'null' for v in r[3:9])
+        return fallback % (texts + numbers + extra)
+    
+    return write_records(path, rows, format_row, buffer_size)
+
+POSE_STORE_VERSION = 2
+
+# frame is 'world' (root-relative poses) or 'relative' (parent-relative,
+# relative=True exports); the two are kept as separate histories
+POSE_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS poses (
+    design TEXT NOT NULL,
+    frame TEXT NOT NULL CHECK (frame IN ('world', 'relative')),
+    version INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    component TEXT NOT NULL,
+    parent TEXT,
+    x REAL NOT NULL, y REAL NOT NULL, z REAL NOT NULL,
+    roll REAL NOT NULL, pitch REAL NOT NULL, yaw REAL NOT NULL,
+    PRIMARY KEY (design, frame, version, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS poses_by_path ON poses (path, design, frame, version);
+CREATE INDEX IF NOT EXISTS poses_by_component ON poses (component, design, frame, version);
+"""
+
+def open_pose_store(path):
+    """
+    Open (creating if needed) a SQLite pose store
+    One row per (design, frame, version, occurrence path); the primary key
+    covers "one version of a design", the path and component indexes cover
+    per-part history
+    """
+    connection = sqlite3.connect(path)
+    store_version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if store_version != POSE_STORE_VERSION:
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'poses'").fetchone()
+        if exists:
+            connection.close()
+            raise ValueError(f'{path} holds pose store version {store_version}, '
+                             f'expected {POSE_STORE_VERSION}')
+        connection.execute(f'PRAGMA user_version = {POSE_STORE_VERSION}')
+    connection.executescript(POSE_STORE_SCHEMA)
+    return connection
+
+def store_poses(connection, components_data, design_name, version=None):
+    """
+    Bulk-insert components_data as one version of design_name with a single
+    executemany in one transaction; an existing version is replaced whole
+    Records with a 'parent' (relative=True) go to the 'relative' frame, the
+    rest to 'world', so the two kinds are never compared with each other
+    version=None stores it as the next version in that frame
+    Returns: the version stored
+    """
+    fields, rows = record_rows(components_data)
+    relative = 'parent' in fields
+    frame = 'relative' if relative else 'world'
+    with connection:
+        if version is None:
+            latest = connection.execute(
+                'SELECT MAX(version) FROM poses WHERE design = ? AND frame = ?',
+                (design_name, frame)).fetchone()[0]
+            version = 1 if latest is None else latest + 1
+        connection.execute('DELETE FROM poses WHERE design = ? AND frame = ? AND version = ?',
+                           (design_name, frame, version))
+        connection.executemany(
+            'INSERT INTO poses (design, frame, version, name, component, path, '
+            'x, y, z, roll, pitch, yaw, parent) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            ((design_name, frame, version) + (row if relative else row + (None,)) for row in rows))
+    return version
+
+def write_sqlite(path, components_data, design_name, version=None):
+    """
+    store_poses into the database file at path
+    Returns: the version stored
+    """
+    connection = open_pose_store(path)
+    try:
+        return store_poses(connection, components_data, design_name, version)
+    finally:
+        connection.close()
+
+def design_version(design):
+    """
+    Version number of the design's saved document, or None when unsaved or
+    headless
+    """
+    try:
+        return design.parentDocument.dataFile.versionNumber
+    except AttributeError:
+        return None
+
+def pose_history(connection, path=None, component=None, design_name=None, frame=None):
+    """
+    Stored poses of one occurrence path (or every occurrence of a component),
+    oldest version first, optionally for one design and frame
+    Returns: list of (design, frame, version, path, x, y, z, roll, pitch, yaw)
+    """
+    if (path is None) == (component is None):
+        raise ValueError('pass exactly one of path or component')
+    column, value = ('path', path) if path is not None else ('component', component)
+    query = ('SELECT design, frame, version, path, x, y, z, roll, pitch, yaw '
+             f'FROM poses WHERE {column} = ?')
+    params = [value]
+    if design_name is not None:
+        query += ' AND design = ?'
+        params.append(design_name)
+    if frame is not None:
+        query += ' AND frame = ?'
+        params.append(frame)
+    query += ' ORDER BY design, frame, version, path'
+    return connection.execute(query, params).fetchall()
+
+def moved_between(connection, design_name, old_version, new_version, translation_tolerance=1e-6,
+                  angle_tolerance=1e-6, frame='world'):
+    """
+    Occurrences of design_name that moved further than translation_tolerance
+    (meters) or turned by more than angle_tolerance (radians) between two
+    stored versions in the same frame; the versions are joined on the
+    primary key and compared like diff_exports, by rotation angle rather
+    than per RPY field, so angle wrap-around is not reported as movement
+    Returns: list of (path, old (x, y, z, roll, pitch, yaw), new (...))
+    """
+    rows = connection.execute(
+        'SELECT a.path, a.x, a.y, a.z, a.roll, a.pitch, a.yaw, '
+        'b.x, b.y, b.z, b.roll, b.pitch, b.yaw '
+        'FROM poses a JOIN poses b '
+        'ON b.design = a.design AND b.frame = a.frame AND b.version = ? AND b.path = a.path '
+        'WHERE a.design = ? AND a.frame = ? AND a.version = ? '
+        'ORDER BY a.path',
+        (new_version, design_name, frame, old_version)).fetchall()
+    old = [row[1:7] for row in rows]
+    new = [row[7:13] for row in rows]
+    if np is not None:
+        old = np.array(old, dtype=np.float64).reshape(-1, 6)
+        new = np.array(new, dtype=np.float64).reshape(-1, 6)
+    return [(rows[k][0], rows[k][1:7], rows[k][7:13])
+            for k, _, _ in pose_deltas(old, new, translation_tolerance, angle_tolerance)]
+
+def load_export(path):
+    """
+    Read a .csv or .jsonl export back into a list of component_info dicts
+    """
+    numeric = ('x', 'y', 'z', 'roll', 'pitch', 'yaw')
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            records = list(csv.DictReader(f))
+            for record in records:
+                for field in numeric:
+                    record[field] = float(record[field])
+                if 'parent' in record:
+                    record['parent'] = record['parent'] or None
+            return records
+        return [json.loads(line) for line in f if line.strip()]
+
+def pose_columns(components_data):
+    """
+    Occurrence paths plus an (N,6) x, y, z, roll, pitch, yaw table
+    (an ndarray, or a list of tuples without NumPy)
+    """
+    if isinstance(components_data, ComponentPoses):
+        paths = components_data.paths
+        columns = [components_data.columns[field] for field in ComponentPoses.FIELDS[3:]]
+        if np is not None:
+            return paths, np.column_stack([np.frombuffer(column) for column in columns])
+        return paths, list(zip(*columns))
+    
+    rows = [row[2:9] for row in record_rows(components_data)[1]]
+    paths = [row[0] for row in rows]
+    values = [row[1:] for row in rows]
+    if np is not None:
+        return paths, np.array(values, dtype=np.float64).reshape(-1, 6)
+    return paths, values
+
+def rpy_to_quaternions(rpy):
+    """
+    (N,3) roll, pitch, yaw (ZYX, as matrix_to_rpy) to (N,4) quaternions (x, y, z, w)
+    """
+    half = np.asarray(rpy, dtype=np.float64) * 0.5
+    cr, cp, cy = np.cos(half).T
+    sr, sp, sy = np.sin(half).T
+    return np.stack([
+        sr*cp*cy - cr*sp*sy,
+        cr*sp*cy + sr*cp*sy,
+        cr*cp*sy - sr*sp*cy,
+        cr*cp*cy + sr*sp*sy,
+    ], axis=1)
+
+def rpy_to_quaternion(roll, pitch, yaw):
+    """
+    Scalar form of rpy_to_quaternions
+    """
+    cr, sr = math.cos(roll * 0.5), math.sin(roll * 0.5)
+    cp, sp = math.cos(pitch * 0.5), math.sin(pitch * 0.5)
+    cy, sy = math.cos(yaw * 0.5), math.sin(yaw * 0.5)
+    return (sr*cp*cy - cr*sp*sy, cr*sp*cy + sr*cp*sy, cr*cp*sy - sr*sp*cy, cr*cp*cy + sr*sp*sy)
+
+def pose_deltas(old, new, translation_tolerance, angle_tolerance):
+    """
+    Distance moved and rotation angle between matched rows of two pose tables
+    ((N,6) arrays, or lists of 6-tuples without NumPy), vectorized
+    Returns: list of (row, translation, angle) for rows above either tolerance
+    """
+    if np is not None:
+        if not len(old):
+            return []
+        translation = np.linalg.norm(new[:, :3] - old[:, :3], axis=1)
+        qa, qb = rpy_to_quaternions(old[:, 3:]), rpy_to_quaternions(new[:, 3:])
+        # q and -q are the same rotation; the chord between the nearer pair
+        # gives the angle accurately even when it is tiny
+        qb *= np.where(np.einsum('ij,ij->i', qa, qb) < 0, -1.0, 1.0)[:, None]
+        chord = np.linalg.norm(qa - qb, axis=1)
+        angle = 4.0 * np.arcsin(np.minimum(chord * 0.5, 1.0))
+        changed = np.flatnonzero((translation > translation_tolerance) | (angle > angle_tolerance))
+        return [(int(k), float(translation[k]), float(angle[k])) for k in changed]
+    
+    deltas = []
+    for k, (a, b) in enumerate(zip(old, new)):
+        translation = math.sqrt((b[0] - a[0])**2 + (b[1] - a[1])**2 + (b[2] - a[2])**2)
+        qa, qb = rpy_to_quaternion(*a[3:]), rpy_to_quaternion(*b[3:])
+        sign = -1.0 if sum(p * q for p, q in zip(qa, qb)) < 0 else 1.0
+        chord = math.sqrt(sum((p - sign * q)**2 for p, q in zip(qa, qb)))
+        angle = 4.0 * math.asin(min(chord * 0.5, 1.0))
+        if translation > translation_tolerance or angle > angle_tolerance:
+            deltas.append((k, translation, angle))
+    return deltas
+
+def diff_exports(old, new, translation_tolerance=1e-6, angle_tolerance=1e-6):
+    """
+    Compare two exports (components_data, or .csv / .jsonl paths) by
+    occurrence path in O(N): one dict index over the old paths, then the
+    deltas of every matched pair in a single vectorized pass
+    Translation delta is the distance moved in meters; angle delta is the
+    rotation angle in radians between the two orientations, so it does not
+    depend on RPY wrap-around or gimbal lock
+    Returns: dict with 'moved' [(path, translation, angle)] above either
+    tolerance (in the new export's order), 'added' and 'removed' paths
+    """
+    if isinstance(old, str):
+        old = load_export(old)
+    if isinstance(new, str):
+        new = load_export(new)
+    old_paths, old_values = pose_columns(old)
+    new_paths, new_values = pose_columns(new)
+    
+    index = {path: i for i, path in enumerate(old_paths)}
+    old_rows, new_rows, added = [], [], []
+    seen = bytearray(len(old_paths))
+    lookup = index.get
+    for j, path in enumerate(new_paths):
+        i = lookup(path)
+        if i is None:
+            added.append(path)
+        else:
+            old_rows.append(i)
+            new_rows.append(j)
+            seen[i] = 1
+    removed = [path for path, matched in zip(old_paths, seen) if not matched]
+    
+    if np is not None:
+        a = old_values[np.asarray(old_rows, dtype=np.intp)]
+        b = new_values[np.asarray(new_rows, dtype=np.intp)]
+    else:
+        a = [old_values[i] for i in old_rows]
+        b = [new_values[j] for j in new_rows]
+    moved = [(new_paths[new_rows[k]], translation, angle)
+             for k, translation, angle in pose_deltas(a, b, translation_tolerance, angle_tolerance)]
+    
+    return {'moved': moved, 'added': added, 'removed': removed}
+
+def export_threaded(design, output_path, format_record=None, chunk_size=512, queue_size=8,
+                    component_cache=None, read_paths=False):
+    """
+    Producer/consumer export: the main thread walks root.allOccurrences
+    (Fusion API calls must stay on it) and hands chunks of raw rows through
+    a bounded queue to a writer thread that does the math, formatting and
+    buffered file writes, so the two stages overlap
+    format_record defaults to the commented <origin> block; pass
+    read_paths=True if it uses 'path', which costs a fullPathName read each
+    Returns: number of occurrences written
+    """
+    if format_record is None:
+        format_record = URDF_ORIGIN_BLOCK_FORMAT.format_map
+    chunks = queue.Queue(maxsize=queue_size)
+    failure = []
+    written = [0]
+    
+    def writer():
+        try:
+            with open(output_path, 'w', encoding='utf-8', buffering=1 << 16) as f:
+                while True:
+                    chunk = chunks.get()
+                    if chunk is None:
+                        return
+                    f.write(''.join(map(format_record, iter_component_origins(chunk))))
+                    written[0] += len(chunk['names'])
+        except BaseException as e:
+            failure.append(e)
+            # Keep draining so the producer never blocks on a full queue
+            while chunks.get() is not None:
+                pass
+    
+    thread = threading.Thread(target=writer, name='origin-rpy-writer', daemon=True)
+    thread.start()
+    try:
+        chunk = empty_snapshot()
+        rows = iter_occurrence_rows(design, None, component_cache, read_paths=read_paths)
+        for name, component, path, m in rows:
+            chunk['transforms'].extend(m)
+            chunk['names'].append(name)
+            chunk['components'].append(component)
+            chunk['paths'].append(path)
+            if len(chunk['names']) >= chunk_size:
+                if failure:
+                    break
+                chunks.put(chunk)
+                chunk = empty_snapshot()
+        if chunk['names'] and not failure:
+            chunks.put(chunk)
+    finally:
+        chunks.put(None)
+        thread.join()
+    
+    if failure:
+        raise failure[0]
+    return written[0]
+
+def write_records(path, records, format_record, buffer_size=1 << 16, header='', footer=''):
+    """
+    Write format_record(record) for each record straight to a buffered file
+    Returns: number of records written
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8', buffering=buffer_size) as f:
+        write = f.write
+        if header:
+            write(header)
+        for record in records:
+            write(format_record(record))
+            count += 1
+        if footer:
+            write(footer)
+    return count
 
-def display_results(ui, components_data):
+URDF_LINK_JOINT_FORMAT = (
+    '  <link name={link}/>\n'
+    '  <joint name={joint} type="fixed">\n'
+    '    <parent link={parent_link}/>\n'
+    '    <child link={link}/>\n'
+    '    ' + URDF_ORIGIN_FORMAT + '\n'
+    '  </joint>\n'
+)
+
+def write_urdf(path, snapshot, robot_name, base_link='base_link', components_data=None):
+    """
+    Stream a URDF document for a tree snapshot to disk in a single pass
+    Occurrences directly under the root are attached to base_link
+    components_data, if already computed with relative=True, is reused
+    """
+    link_names = unique_link_names(snapshot['names'], reserved=(base_link,))
+    parents = snapshot['parents']
+    
+    def format_record(item):
+        i, comp = item
+        parent = parents[i]
+        link = link_names[i]
+        return URDF_LINK_JOINT_FORMAT.format_map(dict(
+            comp,
+            link=quoteattr(link),
+            joint=quoteattr(link + '_joint'),
+            parent_link=quoteattr(link_names[parent] if parent >= 0 else base_link),
+        ))
+    
+    header = (
+        '<?xml version="1.0"?>\n'
+        f'<robot name={quoteattr(robot_name)}>\n'
+        f'  <link name={quoteattr(base_link)}/>\n'
+    )
+    if components_data is None:
+        components_data = iter_component_origins(snapshot, relative=True)
+    records = enumerate(components_data)
+    return write_records(path, records, format_record, header=header, footer='</robot>\n')
+
+def unique_link_names(names, reserved=()):
+    """
+    Make URDF link names from occurrence names, which repeat across subassemblies
+    Returns: list of names, later duplicates suffixed with _2, _3, ...
+    """
+    used = set(reserved)
+    link_names = []
+    for name in names:
+        # ':' and spaces are legal XML but awkward in ROS tooling
+        base = name.replace(':', '_').replace(' ', '_')
+        link = base
+        suffix = 2
+        while link in used:
+            link = f"{base}_{suffix}"
+            suffix += 1
+        used.add(link)
+        link_names.append(link)
+    return link_names
+
+XACRO_MACRO_FORMAT = (
+    '  <xacro:macro name={macro} params="name parent xyz rpy">\n'
+    '    <!-- component: {component} -->\n'
+    '    <link name="${{name}}"/>\n'
+    '    <joint name="${{name}}_joint" type="fixed">\n'
+    '      <parent link="${{parent}}"/>\n'
+    '      <child link="${{name}}"/>\n'
+    '      <origin xyz="${{xyz}}" rpy="${{rpy}}"/>\n'
+    '    </joint>\n'
+    '  </xacro:macro>\n'
+)
+XACRO_INSTANCE_FORMAT = (
+    '  <xacro:{macro} name={link} parent={parent_link}'
+    ' xyz="{x:.6f} {y:.6f} {z:.6f}" rpy="{roll:.6f} {pitch:.6f} {yaw:.6f}"/>\n'
+)
+
+def write_xacro(path, snapshot, robot_name, base_link='base_link', components_data=None):
+    """
+    Stream an instanced xacro document for a tree snapshot to disk
+    Occurrences are grouped by component; the macros are written up front so
+    each occurrence costs a single one-line call
+    """
+    link_names = unique_link_names(snapshot['names'], reserved=(base_link,))
+    parents = snapshot['parents']
+    
+    # Group occurrences by component: one macro name per unique component
+    macros = {}
+    for component in snapshot['components']:
+        if component not in macros:
+            macros[component] = None
+    for component, macro in zip(macros, unique_macro_names(macros)):
+        macros[component] = macro
+    
+    def format_record(item):
+        i, comp = item
+        parent = parents[i]
+        return XACRO_INSTANCE_FORMAT.format_map(dict(
+            comp,
+            macro=macros[comp['component']],
+            link=quoteattr(link_names[i]),
+            parent_link=quoteattr(link_names[parent] if parent >= 0 else base_link),
+        ))
+    
+    header = [
+        '<?xml version="1.0"?>\n',
+        f'<robot name={quoteattr(robot_name)} xmlns:xacro="http://www.ros.org/wiki/xacro">\n',
+        f'  <link name={quoteattr(base_link)}/>\n',
+    ]
+    for component, macro in macros.items():
+        header.append(XACRO_MACRO_FORMAT.format(
+            macro=quoteattr(macro), component=xml_comment_text(component)))
+    
+    if components_data is None:
+        components_data = iter_component_origins(snapshot, relative=True)
+    records = enumerate(components_data)
+    return write_records(path, records, format_record, header=''.join(header), footer='</robot>\n')
+
+def unique_macro_names(components):
+    """
+    Make xacro macro names (XML names) from component names
+    The comp_ prefix keeps them clear of xacro's own elements (include,
+    property, arg, if, ...), which <xacro:name .../> would otherwise call
+    """
+    used = set()
+    macro_names = []
+    for component in components:
+        base = 'comp_' + ''.join(c if c.isascii() and c.isalnum() else '_' for c in component)
+        macro = base
+        suffix = 2
+        while macro in used:
+            macro = f"{base}_{suffix}"
+            suffix += 1
+        used.add(macro)
+        macro_names.append(macro)
+    return macro_names
+
+def xml_comment_text(text):
+    """
+    Make text safe inside <!-- -->: no '--' anywhere and no trailing '-'
+    """
+    while '--' in text:
+        text = text.replace('--', '- -')
+    return text + ' ' if text.endswith('-') else text
+
+def display_results(ui, components_data, stats=None):
     """
     #Display the results in a message box and text output
     """
@@ -100,50 +2256,541 @@ def display_results(ui, components_data):
         ui.messageBox('No components found')
         return
     
-    # Create results text
-    results = f"FOUND {len(components_data)} COMPONENTS:\n\n"
-    results += "Format: Component (Position in meters, RPY in radians)\n"
-    results += "=" * 80 + "\n\n"
+    with timed(stats, 'formatting'):
+        lines, results = format_results_text(components_data)
+    
+    with timed(stats, 'display'):
+        show_results_text(ui, lines, results)
+        
+        # Also print to Text Commands window
+        print_urdf_origins(components_data)
+
+def format_results_text(components_data):
+    """
+    Build the message box text
+    Returns: (lines, results) - the lines and the joined text
+    """
+    # Create results text as a list of lines, joined once
+    lines = [
+        f"FOUND {len(components_data)} COMPONENTS:",
+        "",
+        "Format: Component (Position in meters, RPY in radians)",
+        "=" * 80,
+        "",
+    ]
     
     for comp in components_data:
-        results += f"Component: {comp['name']}\n"
-        results += f"Base: {comp['component']}\n"
-        results += f"Position: ({comp['x']:.6f}, {comp['y']:.6f}, {comp['z']:.6f}) m\n"
-        results += f"RPY: ({comp['roll']:.6f}, {comp['pitch']:.6f}, {comp['yaw']:.6f}) rad\n"
+        lines.append(f"Component: {comp['name']}")
+        lines.append(f"Base: {comp['component']}")
+        lines.append(f"Position: ({comp['x']:.6f}, {comp['y']:.6f}, {comp['z']:.6f}) m")
+        lines.append(f"RPY: ({comp['roll']:.6f}, {comp['pitch']:.6f}, {comp['yaw']:.6f}) rad")
         
         # URDF format
-        xyz = f"{comp['x']:.6f} {comp['y']:.6f} {comp['z']:.6f}"
-        rpy = f"{comp['roll']:.6f} {comp['pitch']:.6f} {comp['yaw']:.6f}"
-        results += f"URDF: <origin xyz=\"{xyz}\" rpy=\"{rpy}\"/>\n\n"
+        lines.append("URDF: " + URDF_ORIGIN_FORMAT.format_map(comp))
+        lines.append("")
     
+    results = "\n".join(lines) + "\n"
+    return lines, results
+
+def show_results_text(ui, lines, results):
+    """
+    Show the results text in one message box, or in parts when it is long
+    """
     # Show ALL components in popup using multiple messages if needed
     if len(results) <= 2000:
         ui.messageBox(results)
     else:
-        # Split into multiple messages to show all components
-        lines = results.split('\n')
-        current_message = ""
+        # Split into multiple messages to show all components,
+        # tracking the running length instead of re-measuring the message
+        lines.append("")
+        current_lines = []
+        current_length = 0
         message_count = 1
         
         for line in lines:
-            if len(current_message + line + '\n') < 1900:
-                current_message += line + '\n'
+            if current_length + len(line) + 1 < 1900:
+                current_lines.append(line)
+                current_length += len(line) + 1
             else:
+                current_message = "\n".join(current_lines) + "\n"
                 ui.messageBox(f"PART {message_count}:\n\n{current_message}")
                 message_count += 1
-                current_message = line + '\n'
+                current_lines = [line]
+                current_length = len(line) + 1
         
         # Show the last part
-        if current_message:
+        if current_lines:
+            current_message = "\n".join(current_lines) + "\n"
             ui.messageBox(f"PART {message_count}:\n\n{current_message}")
-    
-    # Also print to Text Commands window
+
+def print_urdf_origins(components_data):
+    """
+    Print commented <origin> elements to the Text Commands window
+    """
     print("\n" + "="*80)
     print("COMPONENT ORIGINS FOR URDF")
     print("="*80)
-    for comp in components_data:
-        xyz = f"{comp['x']:.6f} {comp['y']:.6f} {comp['z']:.6f}"
-        rpy = f"{comp['roll']:.6f} {comp['pitch']:.6f} {comp['yaw']:.6f}"
-        print(f"<!-- {comp['name']} -->")
-        print(f'<origin xyz="{xyz}" rpy="{rpy}"/>')
-        print()
+    print("".join(map(URDF_ORIGIN_BLOCK_FORMAT.format_map, components_data)), end="")
+
+RESULTS_PALETTE_ID = 'originRpyResultsPalette'
+
+def display_results_palette(ui, components_data, html_path=None, stats=None, print_origins=False):
+    """
+    Display the results once in a scrollable HTML palette
+    The table is virtualized: only rows in view are laid out, so showing
+    50k components costs the same as showing 50
+    print_origins=True also prints every <origin> to the Text Commands window
+    """
+    if not components_data:
+        ui.messageBox('No components found')
+        return
+    
+    if html_path is None:
+        html_path = os.path.join(tempfile.gettempdir(), 'origin_rpy_results.html')
+    with timed(stats, 'formatting'):
+        write_results_html(html_path, components_data)
+    
+    with timed(stats, 'display'):
+        # Replace any palette left over from a previous run
+        palette = ui.palettes.itemById(RESULTS_PALETTE_ID)
+        if palette:
+            palette.deleteMe()
+        ui.palettes.add(RESULTS_PALETTE_ID, f'Component Origins ({len(components_data)})',
+                        html_path.replace('\\', '/'), True, True, True, 1000, 600)
+    
+    if print_origins:
+        with timed(stats, 'print'):
+            print_urdf_origins(components_data)
+
+def write_results_html(path, components_data):
+    """
+    Write a self-contained HTML page with the results embedded as JSON rows
+    """
+    rows = [
+        [comp['name'], comp['component'], comp['x'], comp['y'], comp['z'],
+         comp['roll'], comp['pitch'], comp['yaw']]
+        for comp in components_data
+    ]
+    # '</' would end the <script> element early
+    data = json.dumps(rows, separators=(',', ':')).replace('</', '<\\/')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(RESULTS_HTML_TEMPLATE.replace('__ROWS__', data))
+
+RESULTS_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<style>
+  body { margin: 0; font: 12px monospace; display: flex; flex-direction: column; height: 100vh; }
+  #bar { padding: 4px; border-bottom: 1px solid #ccc; }
+  #view { flex: 1; overflow-y: auto; position: relative; }
+  #rows { position: absolute; left: 0; right: 0; }
+  .row { height: 20px; line-height: 20px; white-space: pre; padding: 0 4px; user-select: text; }
+  .row:nth-child(even) { background: #f4f4f4; }
+  .head { font-weight: bold; border-bottom: 1px solid #ccc; }
+</style>
+</head>
+<body>
+<div id="bar"><span id="count"></span> &mdash; position in meters, RPY in radians
+  <input id="filter" placeholder="filter by name"></div>
+<div class="row head">Component / Base / URDF origin</div>
+<div id="view"><div id="spacer"></div><div id="rows"></div></div>
+<script>
+var ALL = __ROWS__;
+var ROW = 20, rows = ALL;
+var view = document.getElementById('view'), spacer = document.getElementById('spacer'),
+    box = document.getElementById('rows');
+function f(v) { return v.toFixed(6); }
+function line(r) {
+  return r[0] + '  [' + r[1] + ']  <origin xyz="' + f(r[2]) + ' ' + f(r[3]) + ' ' + f(r[4]) +
+         '" rpy="' + f(r[5]) + ' ' + f(r[6]) + ' ' + f(r[7]) + '"/>';
+}
+function render() {
+  // Lay out only the rows inside the viewport plus a small margin
+  var first = Math.max(0, Math.floor(view.scrollTop / ROW) - 10);
+  var last = Math.min(rows.length, first + Math.ceil(view.clientHeight / ROW) + 20);
+  box.style.top = (first * ROW) + 'px';
+  box.textContent = '';
+  for (var i = first; i < last; i++) {
+    var d = document.createElement('div');
+    d.className = 'row';
+    d.textContent = line(rows[i]);
+    box.appendChild(d);
+  }
+}
+function reset() {
+  spacer.style.height = (rows.length * ROW) + 'px';
+  document.getElementById('count').textContent = rows.length + ' of ' + ALL.length + ' components';
+  render();
+}
+document.getElementById('filter').oninput = function () {
+  var q = this.value.toLowerCase();
+  rows = q ? ALL.filter(function (r) { return (r[0] + ' ' + r[1]).toLowerCase().indexOf(q) >= 0; }) : ALL;
+  view.scrollTop = 0;
+  reset();
+};
+view.onscroll = render;
+window.onresize = render;
+reset();
+</script>
+</body>
+</html>
+"""
+
+# Commands that never move occurrences: finishing them needs no refresh
+PASSIVE_COMMANDS = {
+    'SelectCommand', 'PanCommand', 'OrbitCommand', 'FreeOrbitCommand',
+    'ZoomCommand', 'FitCommand', 'ViewCubeCommand',
+}
+
+# Commands that can move any occurrence without selecting it (undo, redo,
+# parameters driving joints): finishing them re-reads every local transform
+SWEEP_COMMANDS = {
+    'UndoCommand', 'RedoCommand', 'ChangeParameterCommand', 'FusionComputeAllCommand',
+}
+
+class LivePoseTable:
+    """
+    Pose table kept current while the design is edited
+    Built once from a tree snapshot that keeps occurrence handles. After that,
+    mark_dirty() flags occurrences whose own placement may have changed
+    (mark_affected() adds what they drive) and refresh() re-reads only those,
+    then recomposes the ones that actually moved and their descendants,
+    instead of a full export
+    An occurrence that moved also has its full path checked, so a re-parent
+    triggers a rebuild, as does a change in the occurrence count
+    """
+    def __init__(self, design, component_cache=None):
+        self.design = design
+        self.component_cache = component_cache
+        self.version = 0
+        self.rebuild()
+    
+    def rebuild(self):
+        """
+        Full re-walk of the design, for first use and structural changes
+        """
+        if self.component_cache is not None:
+            # Components may have been renamed since the cache was filled
+            self.component_cache.clear()
+        snapshot = snapshot_occurrence_tree(self.design, component_cache=self.component_cache,
+                                            keep_occurrences=True)
+        paths = snapshot['paths']
+        parents = snapshot['parents']
+        children = [[] for _ in paths]
+        depth = array('l')
+        # The depth-first walk stores parents before their children
+        for i, parent in enumerate(parents):
+            if parent >= 0:
+                children[parent].append(i)
+                depth.append(depth[parent] + 1)
+            else:
+                depth.append(0)
+        
+        # The same child in every instance of a component shares one local
+        # transform, so moving it in one instance moves it in all of them
+        names = snapshot['names']
+        components = snapshot['components']
+        instances = {}
+        for i, parent in enumerate(parents):
+            if parent >= 0:
+                instances.setdefault((components[parent], names[i]), []).append(i)
+        
+        poses = compute_component_poses(snapshot)
+        self.snapshot = snapshot
+        self.columns = [poses.columns[field] for field in ('x', 'y', 'z', 'roll', 'pitch', 'yaw')]
+        self._lookup = {path: i for i, path in enumerate(paths)}
+        self._children = children
+        self._depth = depth
+        self._instances = {key: group for key, group in instances.items() if len(group) > 1}
+        self._dirty = set()
+        self._stale = False
+        self._load_joints()
+        self.version += 1
+    
+    def _joint_count(self):
+        root = self.design.rootComponent
+        return len(root.allJoints) + len(root.allAsBuiltJoints)
+    
+    def _load_joints(self):
+        """
+        Index which table entries are linked by joints or as-built joints
+        Joints whose occurrences are not in the table (ground, or joints
+        defined inside sub-components) are skipped
+        """
+        root = self.design.rootComponent
+        links = {}
+        count = 0
+        for joints in (root.allJoints, root.allAsBuiltJoints):
+            for joint in joints:
+                count += 1
+                try:
+                    ends = [self._lookup.get(occ.fullPathName)
+                            for occ in (joint.occurrenceOne, joint.occurrenceTwo) if occ is not None]
+                except Exception:
+                    continue
+                ends = {i for i in ends if i is not None}
+                for i in ends:
+                    links.setdefault(i, set()).update(ends - {i})
+        self._joints = links
+        self._joints_seen = count
+    
+    def __len__(self):
+        return len(self.snapshot['paths'])
+    
+    def _indices(self, occurrences):
+        """
+        Table indices of occurrences (handles or full paths)
+        An unknown occurrence means the structure changed: refresh() rebuilds
+        """
+        indices = []
+        for occ in occurrences:
+            path = occ if isinstance(occ, str) else occ.fullPathName
+            index = self._lookup.get(path)
+            if index is None:
+                self._stale = True
+            else:
+                indices.append(index)
+        return indices
+    
+    def mark_dirty(self, occurrences):
+        """
+        Flag occurrences (handles or full paths) whose placement may have changed
+        An unknown occurrence means the structure changed: refresh() rebuilds
+        """
+        self._dirty.update(self._indices(occurrences))
+    
+    def mark_affected(self, occurrences):
+        """
+        Flag occurrences a command touched plus everything that may have moved
+        with them: the same child in other instances of its parent component,
+        and whatever joints link to them or to anything they carry, followed
+        transitively. A changed joint count re-reads the joints and flags the
+        occurrences of every joint, since a new joint snaps its ends together
+        Costs two API calls for the joint count, plus one fullPathName read per
+        occurrence passed in; the expansion itself is table-only
+        """
+        marked = self._dirty
+        if self._joint_count() != self._joints_seen:
+            self._load_joints()
+            marked.update(self._joints)
+        
+        instances = self._instances
+        joints = self._joints
+        names = self.snapshot['names']
+        components = self.snapshot['components']
+        parents = self.snapshot['parents']
+        visited = set()
+        carried = set()
+        stack = self._indices(occurrences)
+        while stack:
+            i = stack.pop()
+            if i in visited:
+                continue
+            visited.add(i)
+            marked.add(i)
+            parent = parents[i]
+            if parent >= 0:
+                stack.extend(instances.get((components[parent], names[i]), ()))
+            # Children move with i, and drive whatever they are jointed to
+            subtree = [i]
+            while subtree:
+                j = subtree.pop()
+                if j in carried:
+                    continue
+                carried.add(j)
+                stack.extend(joints.get(j, ()))
+                subtree.extend(self._children[j])
+    
+    def mark_all_dirty(self):
+        """
+        Flag everything: refresh() then re-reads every local transform but
+        still recomputes only the subtrees that actually moved
+        """
+        self._dirty.update(range(len(self)))
+    
+    def refresh(self):
+        """
+        Re-read dirty occurrences and recompose the subtrees that moved
+        Returns: list of paths whose pose changed
+        """
+        snapshot = self.snapshot
+        paths = snapshot['paths']
+        if not self._stale and len(self.design.rootComponent.allOccurrences) != len(paths):
+            self._stale = True
+        if self._stale:
+            self.rebuild()
+            return list(self.snapshot['paths'])
+        
+        occurrences = snapshot['occurrences']
+        locals_ = snapshot['locals']
+        dirty = sorted(self._dirty, key=self._depth.__getitem__)
+        self._dirty.clear()
+        
+        # Ancestors first, so a moved ancestor's pass covers moved descendants
+        moved = []
+        for i in dirty:
+            occ = occurrences[i]
+            try:
+                local = local_transform_array(occ)
+                shifted = tuple(local) != tuple(locals_[i*16:(i+1)*16])
+                # Only an occurrence that moved pays for the path check
+                renamed = shifted and occ.fullPathName != paths[i]
+            except Exception:
+                # A deleted or replaced occurrence: start over
+                renamed = True
+            if renamed:
+                # Re-parented or gone: the table no longer matches
+                self.rebuild()
+                return list(self.snapshot['paths'])
+            if shifted:
+                locals_[i*16:(i+1)*16] = array('d', local)
+                moved.append(i)
+        
+        worlds = snapshot['transforms']
+        parents = snapshot['parents']
+        x, y, z, roll, pitch, yaw = self.columns
+        changed = []
+        seen = set()
+        for start in moved:
+            if start in seen:
+                continue
+            stack = [start]
+            while stack:
+                i = stack.pop()
+                seen.add(i)
+                changed.append(i)
+                parent = parents[i]
+                local = locals_[i*16:(i+1)*16]
+                if parent < 0:
+                    world = local
+                else:
+                    world = compose_arrays(worlds[parent*16:(parent+1)*16], local)
+                worlds[i*16:(i+1)*16] = array('d', world)
+                x[i], y[i], z[i] = world[3] * 0.01, world[7] * 0.01, world[11] * 0.01
+                roll[i], pitch[i], yaw[i] = rpy_from_array(world)
+                stack.extend(self._children[i])
+        
+        if changed:
+            self.version += 1
+        return [paths[i] for i in changed]
+    
+    def components_data(self):
+        """
+        The current poses as a ComponentPoses (root-relative)
+        """
+        return ComponentPoses(self.snapshot, *self.columns)
+
+# LivePoseTable kept current by the event handlers while live sync runs
+live_table = None
+_live_handlers = []
+_pending_occurrences = []
+
+def start_live_sync(app=None):
+    """
+    Build a LivePoseTable for the active design and subscribe to Fusion's
+    command and document events to keep it current
+    A completed command re-reads what it can plausibly have moved: the
+    selection when it started and when it ended, the occurrences jointed
+    to those and the same child in other instances of a component (see
+    LivePoseTable.mark_affected). SWEEP_COMMANDS re-read everything. A
+    changed occurrence count rebuilds the table; only what actually moved
+    is recomputed
+    Returns: the LivePoseTable
+    """
+    global live_table
+    app = app or adsk.core.Application.get()
+    ui = app.userInterface
+    stop_live_sync()
+    
+    live_table = LivePoseTable(adsk.fusion.Design.cast(app.activeProduct))
+    add_event_handler(ui.commandStarting, adsk.core.ApplicationCommandEventHandler,
+                      on_command_starting)
+    add_event_handler(ui.commandTerminated, adsk.core.ApplicationCommandEventHandler,
+                      on_command_terminated)
+    add_event_handler(app.documentActivated, adsk.core.DocumentEventHandler,
+                      on_document_activated)
+    return live_table
+
+def stop_live_sync():
+    """
+    Unsubscribe the live sync handlers and drop the table
+    """
+    global live_table
+    for event, handler in _live_handlers:
+        event.remove(handler)
+    _live_handlers.clear()
+    _pending_occurrences.clear()
+    live_table = None
+
+def add_event_handler(event, handler_base, callback):
+    """
+    Subscribe callback to a Fusion event, keeping the handler referenced
+    (Fusion drops handlers that get garbage collected)
+    """
+    class Handler(handler_base):
+        def __init__(self):
+            super().__init__()
+        
+        def notify(self, args):
+            try:
+                callback(args)
+            except:
+                print('Failed:\n{}'.format(traceback.format_exc()))
+    
+    handler = Handler()
+    event.add(handler)
+    _live_handlers.append((event, handler))
+    return handler
+
+def selected_occurrences(ui):
+    """
+    Occurrences behind the current selection (faces and bodies count as
+    their owning occurrence, joints as both of their occurrences)
+    """
+    occurrences = []
+    for selection in ui.activeSelections:
+        entity = selection.entity
+        occ = adsk.fusion.Occurrence.cast(entity)
+        if occ is not None:
+            occurrences.append(occ)
+        elif hasattr(entity, 'occurrenceOne'):
+            occurrences.extend(occ for occ in (entity.occurrenceOne, entity.occurrenceTwo)
+                               if occ is not None)
+        else:
+            occ = getattr(entity, 'assemblyContext', None)
+            if occ is not None:
+                occurrences.append(occ)
+    return occurrences
+
+def mark_command_changes(table, command_id, pending, ui):
+    """
+    Flag in table what a completed command can have moved, given the
+    occurrences selected when it started
+    """
+    if command_id in SWEEP_COMMANDS:
+        table.mark_all_dirty()
+    else:
+        # Picks made inside the command dialog may still be selected
+        table.mark_affected(pending + selected_occurrences(ui))
+
+def on_command_starting(args):
+    _pending_occurrences[:] = selected_occurrences(adsk.core.Application.get().userInterface)
+
+def on_command_terminated(args):
+    pending = list(_pending_occurrences)
+    _pending_occurrences.clear()
+    if live_table is None or args.commandId in PASSIVE_COMMANDS:
+        return
+    if args.terminationReason != adsk.core.CommandTerminationReason.CompletedTerminationReason:
+        return
+    mark_command_changes(live_table, args.commandId, pending,
+                         adsk.core.Application.get().userInterface)
+    changed = live_table.refresh()
+    if changed:
+        print(f"Live pose sync: {len(changed)} occurrence(s) updated")
+
+def on_document_activated(args):
+    global live_table
+    design = adsk.fusion.Design.cast(adsk.core.Application.get().activeProduct)
+    live_table = LivePoseTable(design) if design else None
@@ -0,0 +1,44 @@
+"""
+Shared fixtures: origin&rpy.py loaded against the benchmark.py adsk stand-in
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+
+@pytest.fixture(scope='session')
+def script():
+    return benchmark.load_script()
+
+
+@pytest.fixture
+def design(script):
+    # Small but deep and bushy enough for every code path; seeded, so stable
+    return benchmark.build_design(400, 5, 5, 12, 7, script.compose_arrays)
+
+
+@pytest.fixture
+def occurrences_by_path(design):
+    return {occ.fullPathName: occ for occ in design.rootComponent.allOccurrences}
+
+
+def move(script, occ, dx=0.0, local=None):
+    """
+    Shift an occurrence's local transform (cm along x, or replace it) and
+    recompose the world transforms of its subtree, as Fusion would
+    """
+    values = list(local if local is not None else occ._local)
+    values[3] += dx
+    occ._local = tuple(values)
+
+    def update(node, parent_world):
+        node._world = script.compose_arrays(parent_world, node._local) if parent_world else node._local
+        for child in node.childOccurrences:
+            update(child, node._world)
+
+    update(occ, occ.assemblyContext._world if occ.assemblyContext else None)
@@ -0,0 +1,118 @@
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+import benchmark
+from conftest import move
+
+ADDIN_PATH = os.path.join(os.path.dirname(benchmark.SCRIPT_PATH), 'OriginRpyAddIn',
+                          'OriginRpyAddIn.py')
+
+
+class UI:
+    def __init__(self):
+        self.messages = []
+        self.activeSelections = []
+
+    def messageBox(self, text, *args):
+        self.messages.append(text)
+
+
+class App:
+    def __init__(self, design, document='robot'):
+        self.activeProduct = design
+        self.activeDocument = document
+        self.userInterface = UI()
+
+
+class CommandArgs:
+    def __init__(self, command_id):
+        self.commandId = command_id
+        self.terminationReason = 'completed'
+
+
+@pytest.fixture
+def addin(script, monkeypatch):
+    # The handler base classes and Design.cast the add-in needs at import
+    core = sys.modules['adsk.core']
+    for name in ('CommandCreatedEventHandler', 'CommandEventHandler',
+                 'ApplicationCommandEventHandler'):
+        monkeypatch.setattr(core, name, object, raising=False)
+    monkeypatch.setattr(core, 'CommandTerminationReason',
+                        types.SimpleNamespace(CompletedTerminationReason='completed'),
+                        raising=False)
+    monkeypatch.setattr(benchmark.Design, 'cast', staticmethod(lambda product: product),
+                        raising=False)
+    monkeypatch.setattr(script, 'DISPLAY_MODE', 'messages')
+    spec = importlib.util.spec_from_file_location('origin_rpy_addin', ADDIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.core = script
+    return module
+
+
+def assert_table_current(table, script, design):
+    expected = script.get_all_component_origins(design, hierarchical=True)
+    records = table.components_data().to_dicts()
+    assert len(records) == len(expected)
+    for record, reference in zip(records, expected):
+        assert record == pytest.approx(reference, abs=1e-12)
+
+
+def test_repeat_export_reuses_the_table(addin, script, design, capsys):
+    app = App(design)
+    addin.export_active_design(app, app.userInterface)
+    table = addin.state['table']
+    assert_table_current(table, script, design)
+
+    capsys.readouterr()
+    occ = design.rootComponent.allOccurrences[-1]
+    addin.pending[:] = [occ]
+    move(script, occ, dx=1.0)
+    addin.on_command_terminated(app, CommandArgs('FusionMoveCommand'))
+    addin.export_active_design(app, app.userInterface)
+    assert addin.state['table'] is table
+    assert_table_current(table, script, design)
+    # The summary diffs against the previous click, not the live columns
+    assert 'Since the last export: 1 moved' in capsys.readouterr().out
+
+    # Another document gets its own table
+    other = benchmark.build_design(50, 3, 4, 5, 1, script.compose_arrays)
+    app = App(other, 'other')
+    addin.export_active_design(app, app.userInterface)
+    assert addin.state['table'] is not table
+    assert_table_current(addin.state['table'], script, other)
+
+
+def test_repeat_export_reads_only_what_commands_touched(addin, script, design, monkeypatch,
+                                                        capsys):
+    app = App(design)
+    addin.export_active_design(app, app.userInterface)
+    table = addin.state['table']
+
+    reads = []
+    native = benchmark.Occurrence.nativeObject
+    monkeypatch.setattr(benchmark.Occurrence, 'nativeObject',
+                        property(lambda occ: reads.append(occ) or native.fget(occ)))
+    occurrences = design.rootComponent.allOccurrences
+    selected, unselected = occurrences[-1], occurrences[-2]
+    move(script, unselected, dx=1.0)
+    addin.pending[:] = [selected]
+    move(script, selected, dx=1.0)
+    addin.on_command_terminated(app, CommandArgs('FusionMoveCommand'))
+    # Navigation needs nothing re-read
+    addin.on_command_terminated(app, CommandArgs('OrbitCommand'))
+    capsys.readouterr()
+    addin.export_active_design(app, app.userInterface)
+    assert reads == [selected]
+    assert 'Since the last export: 1 moved' in capsys.readouterr().out
+
+    # Undo can move anything, so it flags every occurrence
+    addin.on_command_terminated(app, CommandArgs('UndoCommand'))
+    addin.export_active_design(app, app.userInterface)
+    assert len(reads) == 1 + len(occurrences)
+    assert 'Since the last export: 1 moved' in capsys.readouterr().out
+    assert_table_current(table, script, design)
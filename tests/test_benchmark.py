@@ -0,0 +1,14 @@
+import json
+
+import benchmark
+
+
+def test_benchmark_runs_every_phase(tmp_path, capsys):
+    path = str(tmp_path / 'runs.jsonl')
+    results = benchmark.main(['--count', '300', '--repeat', '1', '--json', path])
+    with open(path, encoding='utf-8') as f:
+        run = json.loads(f.read())
+    assert run['count'] == 300
+    assert set(run['phases']) == set(results)
+    assert all(phase['wall_s'] >= 0 and phase['peak_bytes'] > 0 for phase in results.values())
+    assert 'write_urdf' in capsys.readouterr().out
@@ -0,0 +1,156 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+import benchmark
+
+
+EULER_ORDERS = ('xyz', 'xzy', 'yxz', 'yzx', 'zxy', 'zyx')
+
+
+def random_transforms(count, seed=0):
+    rng = random.Random(seed)
+    return [benchmark.random_transform(rng) for _ in range(count)]
+
+
+def rpy_transform(roll, pitch, yaw):
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return (
+        cy*cp, cy*sp*sr - sy*cr, cy*sp*cr + sy*sr, 0.0,
+        sy*cp, sy*sp*sr + cy*cr, sy*sp*cr - cy*sr, 0.0,
+        -sp, cp*sr, cp*cr, 0.0,
+        0.0, 0.0, 0.0, 1.0,
+    )
+
+
+def gimbal_transforms():
+    # Pitch exactly at +-90 deg, plus the identity and a half turn
+    return [
+        rpy_transform(0.4, math.pi / 2, -1.1),
+        rpy_transform(-0.7, -math.pi / 2, 0.5),
+        rpy_transform(0.0, 0.0, 0.0),
+        rpy_transform(math.pi, 0.0, 0.0),
+    ]
+
+
+def axis_rotation(axis, angle):
+    c, s = math.cos(angle), math.sin(angle)
+    if axis == 0:
+        return np.array([[1, 0, 0], [0, c, -s], [0, s, c]])
+    if axis == 1:
+        return np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+
+
+def euler_matrix(angles, order):
+    axes = ['xyz'.index(a) for a in order]
+    return (axis_rotation(axes[0], angles[0]) @ axis_rotation(axes[1], angles[1])
+            @ axis_rotation(axes[2], angles[2]))
+
+
+def quaternion_matrix(q):
+    x, y, z, w = q
+    return np.array([
+        [1 - 2*(y*y + z*z), 2*(x*y - z*w), 2*(x*z + y*w)],
+        [2*(x*y + z*w), 1 - 2*(x*x + z*z), 2*(y*z - x*w)],
+        [2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x*x + y*y)],
+    ])
+
+
+def rotation_blocks(transforms):
+    return np.array(transforms, dtype=np.float64).reshape(-1, 4, 4)[:, :3, :3]
+
+
+def test_matrices_to_rpy_matches_scalar_path(script):
+    transforms = random_transforms(500) + gimbal_transforms()
+    batch = script.matrices_to_rpy(np.array(transforms))
+    scalar = np.array([script.rpy_from_array(m) for m in transforms])
+    np.testing.assert_allclose(batch, scalar, rtol=0, atol=1e-12)
+
+    # (N,4,4) input and the Matrix3D-based path agree too
+    np.testing.assert_allclose(script.matrices_to_rpy(np.array(transforms).reshape(-1, 4, 4)),
+                               batch, rtol=0, atol=0)
+    matrices = [benchmark.Matrix3D(m) for m in transforms[:20]]
+    np.testing.assert_allclose([script.matrix_to_rpy(m) for m in matrices], batch[:20],
+                               rtol=0, atol=1e-12)
+
+
+def test_matrices_to_rpy_python_fallback(script, monkeypatch):
+    transforms = random_transforms(50, seed=6) + gimbal_transforms()
+    expected = script.matrices_to_rpy(np.array(transforms))
+    monkeypatch.setattr(script, 'np', None)
+    rows = [np.array(m).reshape(4, 4).tolist() for m in transforms]
+    np.testing.assert_allclose(script.matrices_to_rpy(rows), expected, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('order', EULER_ORDERS)
+def test_convert_rotations_euler_round_trip(script, order):
+    transforms = random_transforms(200, seed=2) + gimbal_transforms()
+    rotations = rotation_blocks(transforms)
+    result = script.convert_rotations(np.array(transforms), ('euler', 'matrix'), euler_order=order)
+    np.testing.assert_allclose(result['matrix'], rotations, rtol=0, atol=0)
+    for angles, expected in zip(result['euler'], rotations):
+        np.testing.assert_allclose(euler_matrix(angles, order), expected, rtol=0, atol=1e-9)
+
+
+def test_convert_rotations_gimbal_lock_is_folded(script):
+    transforms = gimbal_transforms()
+    result = script.convert_rotations(np.array(transforms), ('rpy',))
+    assert result['rpy_gimbal_lock'].tolist() == [True, True, False, False]
+    np.testing.assert_allclose(result['rpy'][2:], script.matrices_to_rpy(np.array(transforms[2:])),
+                               rtol=0, atol=1e-12)
+    # RPY is 'zyx' Euler: locked rows zero the last angle (roll), fold it into
+    # yaw, and still rebuild the same rotation
+    for rpy, expected, locked in zip(result['rpy'], rotation_blocks(transforms),
+                                     result['rpy_gimbal_lock']):
+        if locked:
+            assert rpy[0] == 0.0
+        rebuilt = np.array(rpy_transform(*rpy)).reshape(4, 4)[:3, :3]
+        np.testing.assert_allclose(rebuilt, expected, rtol=0, atol=1e-9)
+
+
+def test_convert_rotations_quaternion_round_trip(script):
+    transforms = random_transforms(300, seed=3) + gimbal_transforms()
+    quaternions = script.convert_rotations(np.array(transforms), ('quaternion',))['quaternion']
+    np.testing.assert_allclose(np.linalg.norm(quaternions, axis=1), 1.0, atol=1e-12)
+    assert (quaternions[:, 3] >= 0).all()
+    for q, expected in zip(quaternions, rotation_blocks(transforms)):
+        np.testing.assert_allclose(quaternion_matrix(q), expected, rtol=0, atol=1e-9)
+
+
+def test_convert_rotations_python_fallback_matches_numpy(script, monkeypatch):
+    transforms = random_transforms(100, seed=4) + gimbal_transforms()
+    representations = ('rpy', 'quaternion', 'euler', 'matrix')
+    expected = script.convert_rotations(np.array(transforms), representations, euler_order='xzy')
+    monkeypatch.setattr(script, 'np', None)
+    result = script.convert_rotations(transforms, representations, euler_order='xzy')
+    for key in ('rpy', 'quaternion', 'euler', 'matrix'):
+        np.testing.assert_allclose(np.array(result[key], dtype=np.float64), expected[key],
+                                   rtol=0, atol=1e-12)
+    assert list(result['rpy_gimbal_lock']) == expected['rpy_gimbal_lock'].tolist()
+
+
+def test_rpy_round_trip(script):
+    rng = random.Random(1)
+    for _ in range(200):
+        pose = [rng.uniform(-1, 1) for _ in range(3)] + [
+            rng.uniform(-3.1, 3.1), rng.uniform(-1.5, 1.5), rng.uniform(-3.1, 3.1)]
+        m = script.rpy_to_array(*pose)
+        assert script.rpy_from_array(m) == pytest.approx(pose[3:], abs=1e-9)
+        assert (m[3] * 0.01, m[7] * 0.01, m[11] * 0.01) == pytest.approx(pose[:3], abs=1e-12)
+
+
+def test_rpy_to_quaternions_matches_matrix_conversion(script):
+    rng = random.Random(5)
+    rpy = np.array([[rng.uniform(-3, 3), rng.uniform(-1.5, 1.5), rng.uniform(-3, 3)]
+                    for _ in range(100)])
+    transforms = np.array([script.rpy_to_array(0, 0, 0, *row) for row in rpy])
+    from_matrix = script.convert_rotations(transforms, ('quaternion',))['quaternion']
+    direct = script.rpy_to_quaternions(rpy)
+    direct *= np.where(direct[:, 3] < 0, -1.0, 1.0)[:, None]
+    np.testing.assert_allclose(direct, from_matrix, rtol=0, atol=1e-12)
+    assert script.rpy_to_quaternion(*rpy[0]) == pytest.approx(script.rpy_to_quaternions(rpy)[0])
@@ -0,0 +1,391 @@
+import math
+import random
+import types
+
+import numpy as np
+import pytest
+
+import benchmark
+
+from conftest import move
+
+
+def as_matrices(flat):
+    return np.array(flat, dtype=np.float64).reshape(-1, 4, 4)
+
+
+def assert_records_close(records, expected):
+    # Batch and scalar math may differ by an ulp
+    assert len(records) == len(expected)
+    for record, reference in zip(records, expected):
+        assert record == pytest.approx(reference, abs=1e-12)
+
+
+def test_snapshot_compute_matches_per_occurrence_reads(script, design):
+    expected = []
+    for occ in design.rootComponent.allOccurrences:
+        x, y, z, roll, pitch, yaw = script.get_component_origin_rpy(occ)
+        expected.append({'name': occ.name, 'component': occ.component.name,
+                         'path': occ.fullPathName, 'x': x, 'y': y, 'z': z,
+                         'roll': roll, 'pitch': pitch, 'yaw': yaw})
+    snapshot = script.snapshot_occurrences(design)
+    assert len(snapshot['transforms']) == 16 * len(snapshot['names'])
+    assert_records_close(script.compute_component_origins(snapshot), expected)
+
+
+def test_compute_python_fallback(script, design, monkeypatch):
+    snapshot = script.snapshot_occurrences(design)
+    expected = script.compute_component_origins(snapshot)
+    monkeypatch.setattr(script, 'np', None)
+    assert_records_close(script.compute_component_origins(snapshot), expected)
+
+
+def test_tree_snapshot_matches_fusion_transforms(script, design):
+    snapshot = script.snapshot_occurrence_tree(design)
+    # Depth-first, like allOccurrences
+    occurrences = list(design.rootComponent.allOccurrences)
+    assert snapshot['names'] == [occ.name for occ in occurrences]
+    assert snapshot['paths'] == [occ.fullPathName for occ in occurrences]
+    worlds = as_matrices([occ._world for occ in occurrences])
+    np.testing.assert_allclose(as_matrices(snapshot['transforms']), worlds, rtol=0, atol=1e-9)
+    # Parents always come before their children
+    assert all(parent < i for i, parent in enumerate(snapshot['parents']))
+    assert_records_close(script.get_all_component_origins(design, hierarchical=True),
+                         script.get_all_component_origins(design))
+
+
+def test_relative_transforms_recover_local_transforms(script, design):
+    snapshot = script.snapshot_occurrence_tree(design)
+    locals_ = as_matrices([occ._local for occ in design.rootComponent.allOccurrences])
+    np.testing.assert_allclose(as_matrices(script.relative_transforms(snapshot)), locals_,
+                               rtol=0, atol=1e-9)
+    records = script.compute_component_origins(snapshot, relative=True)
+    assert [record['parent'] for record in records] == [
+        snapshot['names'][parent] if parent >= 0 else None for parent in snapshot['parents']]
+
+
+def test_relative_transforms_python_fallback(script, design, monkeypatch):
+    snapshot = script.snapshot_occurrence_tree(design)
+    expected = as_matrices(script.relative_transforms(snapshot))
+    monkeypatch.setattr(script, 'np', None)
+    np.testing.assert_allclose(as_matrices(script.relative_transforms(snapshot)), expected,
+                               rtol=0, atol=1e-9)
+
+
+def test_iter_component_origins_chunks_match_batch(script, design):
+    for relative in (False, True):
+        snapshot = script.snapshot_occurrence_tree(design)
+        expected = script.compute_component_origins(snapshot, relative)
+        assert list(script.iter_component_origins(snapshot, relative, chunk_size=37)) == expected
+
+
+def test_pose_cache_recomputes_only_moved(script, design, tmp_path):
+    cache_path = str(tmp_path / 'poses.json')
+    for relative in (False, True):
+        snapshot = script.snapshot_design(design, relative)
+        data, changed = script.compute_component_origins_cached(snapshot, cache_path, relative)
+        assert data == script.compute_component_origins(snapshot, relative)
+        assert len(changed) == len(data)
+
+    occ = design.rootComponent.allOccurrences[-1]
+    move(script, occ, dx=1.0)
+    for relative in (False, True):
+        snapshot = script.snapshot_design(design, relative)
+        data, changed = script.compute_component_origins_cached(snapshot, cache_path, relative)
+        assert data == script.compute_component_origins(snapshot, relative)
+        assert changed == [occ.fullPathName]
+
+
+def test_component_poses_match_records(script, design, monkeypatch, tmp_path):
+    for relative in (False, True):
+        snapshot = script.snapshot_occurrence_tree(design)
+        expected = script.compute_component_origins(snapshot, relative)
+        compact = script.compute_component_poses(snapshot, relative)
+        assert len(compact) == len(expected)
+        assert_records_close(compact.to_dicts(), expected)
+        assert dict(compact[-1]) == pytest.approx(expected[-1], abs=1e-12)
+        with pytest.raises(IndexError):
+            compact[len(expected)]
+        cached, _ = script.compute_component_origins_cached(
+            snapshot, str(tmp_path / 'poses.json'), relative, compact=True)
+        assert_records_close(cached.to_dicts(), expected)
+
+    monkeypatch.setattr(script, 'np', None)
+    assert_records_close(script.compute_component_poses(snapshot, True).to_dicts(), expected)
+
+
+def test_component_cache_accounting(script, design):
+    n = len(design.rootComponent.allOccurrences)
+    unique = len({occ.component.entityToken for occ in design.rootComponent.allOccurrences})
+    cache = script.ComponentCache()
+    stats = script.ExportStats()
+    data = script.get_all_component_origins(design, relative=True, stats=stats,
+                                            component_cache=cache)
+    assert data == script.get_all_component_origins(design, relative=True)
+    assert (cache.misses, cache.hits, cache.evictions, len(cache)) == (unique, n - unique, 0, unique)
+    # One token read per occurrence, one name read per component
+    assert stats.calls['component.entityToken'] == n
+    assert stats.calls['component.name'] == unique
+    assert stats.caches['component']['hit_rate'] == pytest.approx((n - unique) / n)
+
+
+def test_component_cache_evicts_least_recently_used(script, design):
+    components = {occ.component.entityToken: occ.component
+                  for occ in design.rootComponent.allOccurrences}
+    a, b, c = list(components.values())[:3]
+    cache = script.ComponentCache(max_size=2)
+    for component in (a, b, a, c, a, b):
+        assert cache.get(component)['name'] == component.name
+    # c evicted b, then b evicted c; a stayed recent throughout
+    assert (cache.hits, cache.misses, cache.evictions, len(cache)) == (2, 4, 2, 2)
+
+
+def test_relative_pose_matches_inverse_composition(script, design, occurrences_by_path):
+    index = script.OccurrenceTreeIndex.from_snapshot(script.snapshot_occurrence_tree(design))
+    paths = list(occurrences_by_path)
+    rng = random.Random(11)
+    pairs = [(rng.choice(paths), rng.choice(paths)) for _ in range(200)]
+    pairs += [(path, None) for path in paths[:20]]
+    for a, b in pairs:
+        world_a = np.array(occurrences_by_path[a]._world).reshape(4, 4)
+        world_b = np.eye(4) if b is None else np.array(occurrences_by_path[b]._world).reshape(4, 4)
+        expected = (np.linalg.inv(world_b) @ world_a).ravel()
+        np.testing.assert_allclose(index.relative_transform(a, b), expected, rtol=0, atol=1e-9)
+        pose = index.relative_pose(a, b)
+        assert pose[:3] == pytest.approx(tuple(expected[[3, 7, 11]] * 0.01), abs=1e-11)
+        assert pose[3:] == pytest.approx(script.rpy_from_array(expected), abs=1e-9)
+
+
+def test_lowest_common_ancestor(script, design, occurrences_by_path):
+    index = script.OccurrenceTreeIndex.from_snapshot(script.snapshot_occurrence_tree(design))
+    for path in occurrences_by_path:
+        parts = path.split('+')
+        assert index.lca(path, path) == path
+        assert index.lca(path, None) is None
+        if len(parts) > 2:
+            sibling_subtree = '+'.join(parts[:2])
+            assert index.lca(path, sibling_subtree) == sibling_subtree
+
+
+def test_tree_index_from_records_matches_snapshot(script, design, occurrences_by_path):
+    snapshot = script.OccurrenceTreeIndex.from_snapshot(script.snapshot_occurrences(design))
+    world = script.OccurrenceTreeIndex.from_components(script.get_all_component_origins(design))
+    relative = script.OccurrenceTreeIndex.from_components(
+        script.get_all_component_origins(design, relative=True))
+    paths = list(occurrences_by_path)
+    for a, b in zip(paths[::7], paths[3::7]):
+        expected = snapshot.relative_pose(a, b)
+        assert world.relative_pose(a, b) == pytest.approx(expected, abs=1e-9)
+        assert relative.relative_pose(a, b) == pytest.approx(expected, abs=1e-9)
+
+
+def test_local_transforms_from_records_match_snapshot(script, design):
+    paths, parents, locals_ = script.local_transforms_from_snapshot(
+        script.snapshot_occurrences(design))
+    for relative in (False, True):
+        records = script.get_all_component_origins(design, relative=relative)
+        got = script.local_transforms_from_components(records)
+        assert got[0] == paths and list(got[1]) == list(parents)
+        np.testing.assert_allclose(as_matrices(got[2]), as_matrices(locals_), rtol=0, atol=1e-9)
+
+def test_forward_kinematics_zero_and_revolute(script, design):
+    snapshot = script.snapshot_occurrence_tree(design)
+    child = next(i for i, parent in enumerate(snapshot['parents']) if parent >= 0)
+    path = snapshot['paths'][child]
+    joints = {path: ('revolute', (0.0, 0.0, 1.0))}
+    fk = script.ForwardKinematics.from_snapshot(snapshot, joints)
+
+    worlds = as_matrices(snapshot['transforms'])
+    worlds[:, :3, 3] *= 0.01
+    np.testing.assert_allclose(fk.evaluate([0.0])[0], worlds, rtol=0, atol=1e-11)
+
+    theta = 0.7
+    c, s = math.cos(theta), math.sin(theta)
+    rotation = np.array([[c, -s, 0, 0], [s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+    expected = worlds[child] @ rotation
+    np.testing.assert_allclose(fk.evaluate([theta])[0, child], expected, rtol=0, atol=1e-11)
+    pose = fk.evaluate([[theta]], output='pose')[0, child]
+    assert pose[3:] == pytest.approx(script.rpy_from_array(expected.ravel()), abs=1e-9)
+
+
+def test_forward_kinematics_prismatic_moves_subtree(script, design):
+    snapshot = script.snapshot_occurrence_tree(design)
+    parents = snapshot['parents']
+    # A non-top-level occurrence whose first child follows it
+    parent = next(i for i in range(len(parents) - 1) if parents[i] >= 0 and parents[i + 1] == i)
+    joints = {snapshot['paths'][parent]: ('prismatic', (0.0, 2.0, 0.0))}
+    for records in (script.get_all_component_origins(design),
+                    script.get_all_component_origins(design, relative=True)):
+        fk = script.ForwardKinematics.from_components(records, joints)
+        rest, slid = fk.evaluate([[0.0], [0.25]])
+        # The joint slides 0.25 m along its own y axis; its child follows
+        shift = rest[parent, :3, 1] * 0.25
+        np.testing.assert_allclose(slid[parent, :3, 3] - rest[parent, :3, 3], shift, atol=1e-9)
+        np.testing.assert_allclose(slid[parent + 1, :3, 3] - rest[parent + 1, :3, 3], shift,
+                                   atol=1e-9)
+
+
+def subtree_paths(occ):
+    paths = [occ.fullPathName]
+    for child in occ.childOccurrences:
+        paths.extend(subtree_paths(child))
+    return paths
+
+
+def test_live_table_refreshes_moved_subtree(script, design):
+    table = script.LivePoseTable(design)
+    occ = next(occ for occ in design.rootComponent.allOccurrences if occ.childOccurrences)
+    move(script, occ, dx=2.0)
+    table.mark_dirty([occ])
+    assert sorted(table.refresh()) == sorted(subtree_paths(occ))
+    assert table.refresh() == []
+    expected = script.get_all_component_origins(design, hierarchical=True)
+    assert_records_close(table.components_data().to_dicts(), expected)
+
+    # A deleted occurrence changes the count: the table rebuilds
+    version = table.version
+    root = design.rootComponent
+    removed = root.allOccurrences.pop()
+    parent = removed.assemblyContext
+    (parent.childOccurrences if parent else root.occurrences).remove(removed)
+    table.mark_dirty([parent or removed])
+    table.refresh()
+    assert table.version > version and len(table) == len(root.allOccurrences)
+
+
+def test_live_table_follows_unselected_moves(script, design):
+    table = script.LivePoseTable(design)
+    parent = next(occ for occ in design.rootComponent.allOccurrences if occ.childOccurrences)
+    move(script, parent, dx=2.0)
+    table.mark_dirty([parent.childOccurrences[0]])
+    table.mark_all_dirty()
+    table.refresh()
+    expected = script.get_all_component_origins(design, hierarchical=True)
+    assert_records_close(table.components_data().to_dicts(), expected)
+
+
+def test_live_table_follows_joints_and_instances(script, design):
+    root = design.rootComponent
+    leaves = [occ for occ in root.allOccurrences if not occ.childOccurrences]
+    driver, driven, unrelated = leaves[0], leaves[-1], leaves[len(leaves) // 2]
+    table = script.LivePoseTable(design)
+
+    # A new joint flags both of its ends; unrelated moves wait for a full sweep
+    root.allJoints.append(benchmark.Joint(driver, driven))
+    move(script, driven, dx=1.0)
+    move(script, unrelated, dx=1.0)
+    table.mark_affected([])
+    assert table.refresh() == [driven.fullPathName]
+    move(script, driven, dx=1.0)
+    table.mark_affected([driver])
+    assert table.refresh() == [driven.fullPathName]
+    table.mark_all_dirty()
+    assert table.refresh() == [unrelated.fullPathName]
+
+    # A joint on a child drives its other end when the parent is touched
+    parent = next(occ for occ in root.allOccurrences
+                  if occ.childOccurrences and driven not in occ.childOccurrences)
+    root.allJoints.append(benchmark.Joint(parent.childOccurrences[0], driven))
+    table.mark_affected([])
+    table.refresh()
+    move(script, driven, dx=1.0)
+    table.mark_affected([parent])
+    assert table.refresh() == [driven.fullPathName]
+
+    # The same child in two instances of a component shares its local transform
+    by_component = {}
+    for occ in root.allOccurrences:
+        if occ.childOccurrences:
+            by_component.setdefault(occ.component.name, []).append(occ)
+    first, second = next((x, y) for group in by_component.values() for x in group for y in group
+                         if not y.fullPathName.startswith(x.fullPathName)
+                         and not x.fullPathName.startswith(y.fullPathName))
+    a, b = first.childOccurrences[0], second.childOccurrences[0]
+    b.name, b.fullPathName = a.name, second.fullPathName + '+' + a.name
+    table = script.LivePoseTable(design)
+    move(script, a, dx=1.0)
+    move(script, b, dx=1.0)
+    table.mark_affected([a])
+    changed = table.refresh()
+    assert a.fullPathName in changed and b.fullPathName in changed
+    assert len(changed) == len(subtree_paths(a)) + len(subtree_paths(b))
+
+
+def test_live_table_checks_paths_only_of_moved(script, design):
+    table = script.LivePoseTable(design)
+    occ = design.rootComponent.allOccurrences[-1]
+    version = table.version
+    occ.fullPathName = 'Renamed:1'
+    table.mark_all_dirty()
+    assert table.refresh() == [] and table.version == version
+    # Once it moves, the path no longer matches and the table rebuilds
+    move(script, occ, dx=1.0)
+    table.mark_dirty([table.snapshot['paths'][-1]])
+    assert len(table.refresh()) == len(table) and table.version > version
+
+class ProgressDialog:
+    def __init__(self, cancel_at):
+        self.cancel_at = cancel_at
+        self.progressValue = 0
+        self.shown = False
+
+    def show(self, title, message, minimum, maximum, step):
+        self.shown = True
+        self.maximum = maximum
+
+    def hide(self):
+        self.shown = False
+
+    @property
+    def wasCancelled(self):
+        return self.progressValue >= self.cancel_at
+
+
+class ProgressUI:
+    def __init__(self, cancel_at):
+        self.dialog = ProgressDialog(cancel_at)
+
+    def createProgressDialog(self):
+        return self.dialog
+
+
+@pytest.mark.parametrize('hierarchical', [False, True])
+def test_cancelled_progress_returns_partial_records(script, design, hierarchical):
+    total = len(design.rootComponent.allOccurrences)
+    progress = script.ExportProgress(ProgressUI(100), total, interval=0.0, check_every=25)
+    data = script.get_all_component_origins(design, hierarchical=hierarchical, progress=progress)
+    progress.close()
+    assert progress.cancelled and not progress.dialog.shown
+    assert progress.count == 100
+    assert 0 < len(data) < total
+    # The partial records match the first ones of a full export
+    expected = script.get_all_component_origins(design, hierarchical=hierarchical)
+    assert_records_close(data, expected[:len(data)])
+
+
+def test_run_enumerates_all_occurrences_once(script, design, monkeypatch, capsys):
+    class Root:
+        def __init__(self, root):
+            self._root = root
+            self.enumerations = 0
+
+        def __getattr__(self, name):
+            return getattr(self._root, name)
+
+        @property
+        def allOccurrences(self):
+            self.enumerations += 1
+            return self._root.allOccurrences
+
+    class UI(ProgressUI):
+        def messageBox(self, text, *args):
+            pass
+
+    root = Root(design.rootComponent)
+    design.rootComponent = root
+    app = types.SimpleNamespace(activeProduct=design, userInterface=UI(10 ** 9))
+    monkeypatch.setattr(benchmark.Application, 'active', app)
+    monkeypatch.setattr(script, 'DISPLAY_MODE', 'messages')
+    script.run(None)
+    assert root.enumerations == 1
+    assert app.userInterface.dialog.maximum == len(root.allOccurrences)
@@ -0,0 +1,381 @@
+import gc
+import importlib.util
+import json
+import math
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import benchmark
+from conftest import move
+
+
+def test_urdf_origins_stream(script, design, tmp_path):
+    path = str(tmp_path / 'origins.txt')
+    snapshot = script.snapshot_occurrences(design)
+    count = script.write_urdf_origins(path, script.iter_component_origins(snapshot))
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert count == len(snapshot['names']) == text.count('<origin ')
+
+
+def test_display_results_splits_long_text(script, design, capsys):
+    class UI:
+        def __init__(self):
+            self.messages = []
+
+        def messageBox(self, text, *args):
+            self.messages.append(text)
+
+    ui = UI()
+    data = script.get_all_component_origins(design)
+    script.display_results(ui, data)
+    assert len(ui.messages) > 1
+    assert all(len(message) < 2000 for message in ui.messages)
+    text = ''.join(ui.messages)
+    assert all(f"Component: {record['name']}\n" in text for record in data)
+    assert capsys.readouterr().out.count('<origin ') == len(data)
+
+
+def test_urdf_is_well_formed(script, design, tmp_path):
+    path = str(tmp_path / 'robot.urdf')
+    count = len(script.export(design, path))
+    robot = ET.parse(path).getroot()
+    links = [link.get('name') for link in robot.findall('link')]
+    joints = robot.findall('joint')
+    assert count == len(joints) == len(design.rootComponent.allOccurrences)
+    assert len(set(links)) == len(links) == count + 1
+    assert {joint.find('parent').get('link') for joint in joints} <= set(links)
+
+
+def test_unique_link_names(script):
+    names = ['arm:1', 'arm 1', 'base_link', 'arm_1']
+    assert script.unique_link_names(names, reserved=('base_link',)) == [
+        'arm_1', 'arm_1_2', 'base_link_2', 'arm_1_3']
+
+
+def test_results_html_escapes_script_end(script, tmp_path):
+    records = [{'name': '</script><b>x', 'component': 'a"b\'c', 'x': 1.0, 'y': 2.0, 'z': 3.0,
+                'roll': 0.1, 'pitch': 0.2, 'yaw': 0.3}]
+    path = str(tmp_path / 'results.html')
+    script.write_results_html(path, records)
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert text.count('</script>') == 1
+    rows = json.loads(text.split('var ALL = ', 1)[1].split(';\n', 1)[0])
+    assert rows == [['</script><b>x', 'a"b\'c', 1.0, 2.0, 3.0, 0.1, 0.2, 0.3]]
+
+
+def test_results_palette_replaces_previous(script, design, tmp_path, capsys):
+    class Palette:
+        def __init__(self, palettes, id):
+            self.palettes, self.id = palettes, id
+
+        def deleteMe(self):
+            del self.palettes.items[self.id]
+
+    class Palettes:
+        def __init__(self):
+            self.items = {}
+            self.added = 0
+
+        def itemById(self, id):
+            return self.items.get(id)
+
+        def add(self, id, title, url, *args):
+            self.items[id] = Palette(self, id)
+            self.added += 1
+
+    class UI:
+        palettes = Palettes()
+
+    data = script.get_all_component_origins(design)
+    for _ in range(2):
+        script.display_results_palette(UI, data, str(tmp_path / 'results.html'))
+    assert UI.palettes.added == 2
+    assert list(UI.palettes.items) == [script.RESULTS_PALETTE_ID]
+    # Printing every record is opt-in
+    assert capsys.readouterr().out == ''
+    script.display_results_palette(UI, data, str(tmp_path / 'results.html'), print_origins=True)
+    assert capsys.readouterr().out.count('<origin ') == len(data)
+
+
+def test_export_runs_without_adsk(script, design, tmp_path, monkeypatch):
+    for name in ('adsk', 'adsk.core', 'adsk.fusion'):
+        monkeypatch.setitem(sys.modules, name, None)
+    spec = importlib.util.spec_from_file_location('origin_rpy_headless', benchmark.SCRIPT_PATH)
+    headless = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(headless)
+    assert headless.adsk is None
+
+    assert headless.export(design) == script.get_all_component_origins(design)
+    path = str(tmp_path / 'robot.urdf')
+    data = headless.export(design, path)
+    assert data == script.get_all_component_origins(design, relative=True)
+    assert len(ET.parse(path).getroot().findall('joint')) == len(data)
+
+
+def test_export_stats_count_api_calls(script, design, tmp_path):
+    n = len(design.rootComponent.allOccurrences)
+    stats = script.ExportStats()
+    data = script.export(design, str(tmp_path / 'origins.txt'), stats=stats)
+    # The <origin> list never shows paths, so they are not read
+    assert data == [dict(record, path=None) for record in script.export(design)]
+    assert stats.calls == {'transform2': n, 'asArray': n, 'name': n, 'component.name': n}
+    assert set(stats.phases) == {'traversal', 'transform_fetch', 'math', 'write'}
+
+    stats = script.ExportStats()
+    script.get_all_component_origins(design, relative=True, stats=stats)
+    # The tree walk reads local transforms and builds paths itself
+    assert stats.calls == {'nativeObject': n, 'transform2': n, 'asArray': n, 'name': n,
+                           'component.name': n, 'childOccurrences': n}
+
+    log = str(tmp_path / 'metrics.jsonl')
+    stats.append_jsonl(log, design='root')
+    with open(log, encoding='utf-8') as f:
+        record = json.loads(f.read())
+    assert record['design'] == 'root' and record['calls'] == stats.calls
+    assert record['total_s'] == pytest.approx(sum(stats.phases.values()))
+
+
+def test_pose_snapshot_round_trip(script, design, tmp_path):
+    path = str(tmp_path / 'poses.bin')
+    snapshot = script.snapshot_occurrence_tree(design)
+    script.write_pose_snapshot(path, snapshot)
+    expected = script.compute_component_origins(snapshot)
+    with script.PoseSnapshotReader(path) as reader:
+        assert len(reader) == len(expected)
+        for i in (0, len(reader) // 2, len(reader) - 1):
+            assert reader.name(i) == snapshot['names'][i]
+            assert reader.component(i) == snapshot['components'][i]
+            assert reader.path(i) == snapshot['paths'][i]
+            assert list(reader.transform(i)) == list(snapshot['transforms'][i*16:(i+1)*16])
+            assert reader.pose(i) == pytest.approx(
+                tuple(expected[i][field] for field in ('x', 'y', 'z', 'roll', 'pitch', 'yaw')),
+                abs=1e-12)
+        assert list(reader.parents) == list(snapshot['parents'])
+        parents, transforms, poses = reader.as_numpy()
+    # Closing with arrays still alive neither raises nor invalidates them
+    assert parents.tolist() == list(snapshot['parents'])
+    assert poses.shape == (len(expected), 6)
+    reader.close()
+    del parents, transforms, poses
+    gc.collect()
+
+    # Flat snapshots recover the same hierarchy from their paths
+    flat = script.snapshot_occurrences(design)
+    assert script.parents_from_paths(flat['paths']) == snapshot['parents']
+
+
+def test_pose_snapshot_rejects_other_files(script, design, tmp_path, monkeypatch):
+    good = tmp_path / 'poses.bin'
+    script.write_pose_snapshot(str(good), script.snapshot_occurrence_tree(design))
+    data = good.read_bytes()
+    header = script.POSE_SNAPSHOT_HEADER
+    fields = header.unpack_from(data)
+
+    def corrupt(index, value):
+        changed = list(fields)
+        changed[index] = value
+        return header.pack(*changed) + data[header.size:]
+
+    maps = []
+    mmap = script.mmap.mmap
+    monkeypatch.setattr(script.mmap, 'mmap', lambda *args, **kwargs: maps.append(
+        mmap(*args, **kwargs)) or maps[-1])
+    path = tmp_path / 'other.bin'
+    for content in (b'', b'ORPYSNAP', b'NOTASNAP' + bytes(header.size), data[:-8],
+                    corrupt(1, 99), corrupt(2, fields[2] + 1), corrupt(4, fields[5]),
+                    corrupt(7, fields[7] + 8)):
+        path.write_bytes(content)
+        with pytest.raises(ValueError):
+            script.PoseSnapshotReader(str(path))
+    # Every failure closed its mapping
+    assert maps and all(m.closed for m in maps)
+
+
+def test_pose_snapshot_needs_paths(script, design, tmp_path):
+    path = tmp_path / 'poses.bin'
+    with pytest.raises(ValueError, match='read_paths=True'):
+        script.write_pose_snapshot(str(path), script.snapshot_occurrences(design, read_paths=False))
+    assert not path.exists()
+
+
+def test_xacro_expands_to_the_urdf_joints(script, design, tmp_path):
+    # Names that clash with xacro built-ins or break XML comments
+    components = {occ.component for occ in design.rootComponent.allOccurrences}
+    for component, name in zip(sorted(components, key=lambda c: c.entityToken),
+                               ('include', 'property', 'bad---name-', 'arg', '9 lives')):
+        component.name = name
+
+    urdf_path = str(tmp_path / 'robot.urdf')
+    data = script.export(design, urdf_path)
+    joints = {joint.find('child').get('link'): (joint.find('parent').get('link'),
+                                               joint.find('origin').get('xyz'),
+                                               joint.find('origin').get('rpy'))
+              for joint in ET.parse(urdf_path).getroot().findall('joint')}
+
+    xacro_path = str(tmp_path / 'robot.xacro')
+    script.export(design, xacro_path)
+    root = ET.parse(xacro_path).getroot()
+    ns = '{http://www.ros.org/wiki/xacro}'
+    macros = {element.get('name') for element in root.iter(ns + 'macro')}
+    assert len(macros) == len({record['component'] for record in data})
+    assert all(name.startswith('comp_') for name in macros)
+    calls = [element for element in root if element.tag.startswith(ns)
+             and element.tag != ns + 'macro']
+    assert {call.tag[len(ns):] for call in calls} == macros
+    # Each call expands to the link and joint write_urdf emits
+    assert {call.get('name'): (call.get('parent'), call.get('xyz'), call.get('rpy'))
+            for call in calls} == joints
+
+
+def test_threaded_export_matches_streamed_origins(script, design, tmp_path):
+    threaded = str(tmp_path / 'threaded.txt')
+    streamed = str(tmp_path / 'streamed.txt')
+    count = script.export_threaded(design, threaded, chunk_size=37, queue_size=2)
+    snapshot = script.snapshot_occurrences(design)
+    assert count == script.write_urdf_origins(streamed, script.iter_component_origins(snapshot))
+    with open(threaded, encoding='utf-8') as a, open(streamed, encoding='utf-8') as b:
+        assert a.read() == b.read()
+
+    # Paths are read only on request
+    paths = str(tmp_path / 'paths.txt')
+    script.export_threaded(design, paths, '{path}\n'.format_map, read_paths=True)
+    with open(paths, encoding='utf-8') as f:
+        assert f.read().split() == snapshot['paths']
+
+
+def test_threaded_export_stops_on_writer_failure(script, design, tmp_path, monkeypatch):
+    reads = []
+    transform2 = benchmark.Occurrence.transform2
+    monkeypatch.setattr(benchmark.Occurrence, 'transform2',
+                        property(lambda occ: reads.append(occ) or transform2.fget(occ)))
+
+    def format_record(record):
+        raise ValueError('cannot format ' + record['name'])
+
+    with pytest.raises(ValueError, match='cannot format'):
+        script.export_threaded(design, str(tmp_path / 'failed.txt'), format_record,
+                               chunk_size=10, queue_size=1)
+    # The writer kept draining, so the producer never blocked and stopped
+    # within a few chunks of the failure
+    assert 0 < len(reads) < len(design.rootComponent.allOccurrences) // 2
+
+
+def assert_records_close(records, expected, tolerance):
+    assert len(records) == len(expected)
+    for record, reference in zip(records, expected):
+        assert record['path'] == reference['path']
+        assert record['name'] == reference['name']
+        assert record.get('parent') == reference.get('parent')
+        for field in ('x', 'y', 'z', 'roll', 'pitch', 'yaw'):
+            assert record[field] == pytest.approx(reference[field], abs=tolerance)
+
+@pytest.mark.parametrize('extension', ['.csv', '.jsonl'])
+@pytest.mark.parametrize('relative', [False, True])
+def test_table_exports_round_trip(script, design, tmp_path, extension, relative):
+    path = str(tmp_path / ('poses' + extension))
+    data = script.export(design, path, relative=relative)
+    assert_records_close(script.load_export(path), data, 1e-6)
+    # Compact poses and dict records write the same file
+    compact = str(tmp_path / ('compact' + extension))
+    writer = script.write_csv if extension == '.csv' else script.write_jsonl
+    writer(compact, script.get_all_component_origins(design, relative=relative, compact=True))
+    with open(path, encoding='utf-8') as a, open(compact, encoding='utf-8') as b:
+        assert a.read() == b.read()
+
+
+def test_csv_quotes_awkward_names(script, tmp_path):
+    records = [{'name': 'a,"b"', 'component': 'line\nbreak', 'path': 'p', 'x': 1.0, 'y': 2.0,
+                'z': 3.0, 'roll': 0.1, 'pitch': 0.2, 'yaw': 0.3}]
+    path = str(tmp_path / 'awkward.csv')
+    script.write_csv(path, records)
+    assert_records_close(script.load_export(path), records, 1e-6)
+
+
+def test_sqlite_store_history_and_moves(script, design, tmp_path):
+    path = str(tmp_path / 'poses.db')
+    connection = script.open_pose_store(path)
+    try:
+        world = script.get_all_component_origins(design)
+        assert script.store_poses(connection, world, 'robot') == 1
+        assert script.store_poses(connection, script.get_all_component_origins(
+            design, relative=True), 'robot') == 1
+
+        occ = design.rootComponent.allOccurrences[-1]
+        move(script, occ, dx=1.0)
+        assert script.store_poses(connection, script.get_all_component_origins(design), 'robot') == 2
+
+        moved = script.moved_between(connection, 'robot', 1, 2)
+        assert [path for path, _, _ in moved] == [occ.fullPathName]
+        assert script.moved_between(connection, 'robot', 1, 2, frame='relative') == []
+
+        history = script.pose_history(connection, path=occ.fullPathName, frame='world')
+        assert [row[2] for row in history] == [1, 2]
+        # Shifted 1 cm along its parent's x axis
+        assert math.dist(history[0][4:7], history[1][4:7]) == pytest.approx(0.01)
+    finally:
+        connection.close()
+
+
+def test_sqlite_moves_ignore_angle_wrap_around(script, tmp_path):
+    def record(yaw):
+        return [{'name': 'a', 'component': 'c', 'path': 'a', 'x': 0.0, 'y': 0.0, 'z': 0.0,
+                 'roll': 0.0, 'pitch': 0.0, 'yaw': yaw}]
+
+    connection = script.open_pose_store(str(tmp_path / 'wrap.db'))
+    try:
+        script.store_poses(connection, record(math.pi - 1e-12), 'wrap', 1)
+        script.store_poses(connection, record(-math.pi + 1e-12), 'wrap', 2)
+        script.store_poses(connection, record(-math.pi + 0.01), 'wrap', 3)
+        assert script.moved_between(connection, 'wrap', 1, 2) == []
+        assert len(script.moved_between(connection, 'wrap', 1, 3)) == 1
+    finally:
+        connection.close()
+
+
+def test_jsonl_writes_null_for_non_finite(script, tmp_path):
+    records = [{'name': 'a', 'component': 'c', 'path': None, 'x': float('nan'), 'y': 1.0,
+                'z': float('inf'), 'roll': 0.0, 'pitch': 0.0, 'yaw': -float('inf')}]
+    path = str(tmp_path / 'bad.jsonl')
+    script.write_jsonl(path, records)
+    with open(path, encoding='utf-8') as f:
+        loaded = json.loads(f.read())
+    assert loaded == {'name': 'a', 'component': 'c', 'path': None, 'x': None, 'y': 1.0,
+                      'z': None, 'roll': 0.0, 'pitch': 0.0, 'yaw': None}
+
+def test_diff_exports(script, design, tmp_path):
+    old_path = str(tmp_path / 'old.jsonl')
+    new_path = str(tmp_path / 'new.csv')
+    old = script.export(design, old_path)
+    assert script.diff_exports(old_path, old_path) == {'moved': [], 'added': [], 'removed': []}
+
+    occurrences = design.rootComponent.allOccurrences
+    shifted, turned = occurrences[-1], occurrences[-3]
+    move(script, shifted, dx=1.0)
+    turn = script.rpy_to_array(0, 0, 0, 0.0, 0.0, 0.25)
+    move(script, turned, local=script.compose_arrays(turned._local, turn))
+    removed = occurrences.pop(0)
+    script.export(design, new_path)
+
+    report = script.diff_exports(old_path, new_path, 1e-5, 1e-5)
+    deltas = {path: (translation, angle) for path, translation, angle in report['moved']}
+    assert deltas[shifted.fullPathName] == pytest.approx((0.01, 0.0), abs=1e-5)
+    assert deltas[turned.fullPathName][1] == pytest.approx(0.25, abs=1e-5)
+    assert report['removed'] == [removed.fullPathName]
+    assert report['added'] == []
+
+    # In-memory and pure-Python comparisons agree with the file-based one
+    new = script.get_all_component_origins(design, compact=True)
+    assert script.diff_exports(old, new, 1e-5, 1e-5)['removed'] == report['removed']
+    numpy = script.np
+    try:
+        script.np = None
+        fallback = script.diff_exports(old, new.to_dicts(), 1e-5, 1e-5)
+    finally:
+        script.np = numpy
+    assert [path for path, _, _ in fallback['moved']] == list(deltas)
+    for path, translation, angle in fallback['moved']:
+        assert (translation, angle) == pytest.approx(deltas[path], abs=1e-5)